@@ -16,15 +16,18 @@ import multiprocessing
 # Bind address
 bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
 
-# Worker processes (default: conservative cap for I/O-heavy app)
-_default_workers = min(4, max(1, multiprocessing.cpu_count() * 2))
+# Worker processes: мало процессов (каждый держит предзагруженное приложение в памяти),
+# параллелизм запросов — потоками внутри воркера
+_default_workers = min(4, max(2, multiprocessing.cpu_count() // 2))
 workers = int(os.getenv("GUNICORN_WORKERS", str(_default_workers)))
 
 # Threads per worker (фоновые задачи ушли в Celery — потоки заняты только HTTP)
-threads = int(os.getenv("GUNICORN_THREADS", 4))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
 
-# Worker class
-worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+# Worker class: gthread — долгий запрос занимает поток, а не весь процесс.
+# Если какая-то библиотека окажется не потокобезопасной: GUNICORN_WORKER_CLASS=sync,
+# GUNICORN_THREADS=1 и GUNICORN_WORKERS по числу ядер (не cpu*2+1).
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
 
 # Request timeout (seconds)
 timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
@@ -34,7 +37,8 @@ graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
 keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
 
 max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
-max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 50))
+# Разброс перезапусков, чтобы воркеры не перезапускались одновременно
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
 
 # Logging
 loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -25,11 +25,8 @@ def run_gunicorn():
     """Запускает production-сервер через Gunicorn с конфигом entrypoints/gunicorn_config.py (только Unix)."""
     import subprocess
 
-    bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
-    workers = os.getenv("GUNICORN_WORKERS", "4")
-    threads = os.getenv("GUNICORN_THREADS", "2")
-    timeout = os.getenv("GUNICORN_TIMEOUT", "120")
-    loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+    # Те же значения, что вычислит Gunicorn при загрузке конфига (в том числе число воркеров по CPU)
+    from entrypoints import gunicorn_config
 
     cmd = [
         sys.executable, "-m", "gunicorn",
@@ -37,8 +34,8 @@ def run_gunicorn():
         "entrypoints.wsgi:app"
     ]
 
-    print(f"[Production] Starting Gunicorn on {bind}")
-    print(f"[Production] Workers: {workers}, Threads: {threads}")
+    print(f"[Production] Starting Gunicorn on {gunicorn_config.bind}")
+    print(f"[Production] Workers: {gunicorn_config.workers}, Threads: {gunicorn_config.threads}")
 
     subprocess.run(cmd)
 
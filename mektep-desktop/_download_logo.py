@@ -26,6 +26,7 @@ URLS = [
     "https://mektep-analyzer.kz/static/img/logo.png",
     "https://mektep-analyzer.kz/assets/img/logo_edus_logo_white.png",
 ]
+ICO_SIZES = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
 
 
 def load_local_logo() -> bytes | None:
@@ -37,16 +38,19 @@ def load_local_logo() -> bytes | None:
 
 
 def download_logo() -> bytes | None:
-    for url in URLS:
-        print(f"Trying: {url}")
-        try:
-            response = requests.get(url, timeout=10, verify=False)
-            if response.status_code == 200 and len(response.content) > 100:
-                print(f"  -> OK, {len(response.content)} bytes")
-                return response.content
-            print(f"  -> Status {response.status_code}, size {len(response.content)}")
-        except Exception as exc:
-            print(f"  -> Error: {exc}")
+    # Одна сессия на все URL: соединение с тем же хостом переиспользуется
+    with requests.Session() as session:
+        session.verify = False
+        for url in URLS:
+            print(f"Trying: {url}")
+            try:
+                response = session.get(url, timeout=10)
+                if response.status_code == 200 and len(response.content) > 100:
+                    print(f"  -> OK, {len(response.content)} bytes")
+                    return response.content
+                print(f"  -> Status {response.status_code}, size {len(response.content)}")
+            except Exception as exc:
+                print(f"  -> Error: {exc}")
     return None
 
 
@@ -83,8 +87,9 @@ def main():
     offset_y = (icon_size - logo_resized.height) // 2
     bg.paste(logo_resized, (offset_x, offset_y), logo_resized)
 
-    sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-    bg.save(ico_path, format="ICO", sizes=sizes)
+    # Каждый размер готовим сами (LANCZOS от исходного холста) и передаём в ICO списком
+    icons = [bg.resize(size, Image.Resampling.LANCZOS) for size in ICO_SIZES]
+    icons[-1].save(ico_path, format="ICO", sizes=ICO_SIZES, append_images=icons[:-1])
     print(f"ICO saved: {ico_path}")
     print("\nГотово!")
 
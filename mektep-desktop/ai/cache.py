@@ -0,0 +1,261 @@
+"""
+Кэш ответов AI-генератора
+
+Точный кэш: ключ — SHA-256 от (модель, системный промпт, входные поля),
+значение — готовый результат анализа. Хранится в памяти (LRU) и в SQLite-базе
+~/.mektep/llm_cache.sqlite, чтобы повторный запрос по тем же целям не ходил в сеть
+и после перезапуска приложения; записи старше 90 дней удаляются.
+
+Структурный кэш: тот же точный кэш, но ключ строится по «скелету» списка целей —
+без нумерации, кодов целей (7.2.1.1), знаков препинания, регистра и лишних пробелов.
+
+Семантический кэш: почти совпадающие тексты целей (другая нумерация, пробелы,
+мелкие правки формулировок) находятся по косинусной близости векторов
+символьных триграмм.
+"""
+import copy
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CACHE_DIR = Path.home() / ".mektep"
+
+# Ведущая нумерация пункта («1.», «2)», «-», «•») и код цели («7.2.1.1»); одиночное число
+# без точки или скобки — часть текста цели («2 таңбалы сандар»), а не номер пункта
+_SKELETON_LEAD_RE = re.compile(r"^\s*(?:(?:\d+[.)]|[-•*])\s+)?(?:\d+(?:\.\d+)+\.?\s+)?")
+_SKELETON_PUNCT_RE = re.compile(r"[\W_]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def make_cache_key(*parts: str) -> str:
+    """SHA-256 от частей ключа, склеенных через разделитель."""
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def goal_skeleton(text: str) -> str:
+    """Скелет списка целей: строка на пункт без ведущей нумерации/кода, пунктуации и регистра."""
+    lines = []
+    for line in (text or "").splitlines():
+        # Числа внутри текста цели («в пределах 100») значимы и остаются
+        line = _SKELETON_LEAD_RE.sub("", line.lower())
+        words = _SKELETON_PUNCT_RE.sub(" ", line).split()
+        if words:
+            lines.append(" ".join(words))
+    return "\n".join(lines)
+
+
+class ResponseCache:
+    """LRU-кэш результатов в памяти поверх таблицы SQLite"""
+
+    MAX_AGE_DAYS = 90
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = 512, table: str = "llm_cache"):
+        """
+        Args:
+            path: Файл SQLite для сохранения между запусками (None — только память)
+            max_entries: Максимум записей в памяти; при переполнении вытесняются самые старые
+            table: Таблица в файле (несколько кэшей могут делить одну базу)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Открывает базу при первом обращении; при ошибке кэш работает только в памяти."""
+        if self._conn is not None or not self.path:
+            return self._conn
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False)
+            # WAL + NORMAL: запись не ждёт fsync на каждую вставку
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, result BLOB, created_at REAL)"
+            )
+            conn.commit()
+        except (OSError, sqlite3.Error):
+            self.path = None
+            return None
+        self._conn = conn
+        self._vacuum(self.MAX_AGE_DAYS)
+        return conn
+
+    def _vacuum(self, days: float) -> int:
+        """Удаляет записи старше days дней (под self._lock); возвращает их число."""
+        try:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - days * 86400,)
+            )
+            self._conn.commit()
+            return cur.rowcount
+        except sqlite3.Error:
+            return 0
+
+    def vacuum_older_than(self, days: float = MAX_AGE_DAYS) -> int:
+        """Удаляет с диска записи старше days дней; возвращает их число."""
+        with self._lock:
+            if self._connection() is None:
+                return 0
+            return self._vacuum(days)
+
+    def _remember(self, key: str, value: Dict):
+        """Кладёт результат в LRU в памяти."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Копия сохранённого результата или None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(value)
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(f"SELECT result FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                value = json.loads(row[0]) if row else None
+            except (sqlite3.Error, ValueError):
+                return None
+            if not isinstance(value, dict):
+                return None
+            self._remember(key, value)
+            return copy.deepcopy(value)
+
+    def put(self, key: str, value: Dict):
+        """Сохраняет копию результата в памяти и в базе; ошибки записи не мешают генерации."""
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, result, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False).encode("utf-8"), time.time()),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+
+def _trigram_vector(text: str) -> Dict[str, float]:
+    """Нормированный вектор частот символьных триграмм по скелету текста (слова и числа)."""
+    # Нумерация пунктов, пунктуация и пробелы не должны влиять на близость
+    norm = " ".join(goal_skeleton(text).split())
+    padded = f"  {norm} "
+    counts = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    length = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {gram: c / length for gram, c in counts.items()}
+
+
+def _goal_numbers(text: str) -> List[str]:
+    """Числа из текста целей без нумерации пунктов и кодов целей."""
+    return _NUMBER_RE.findall(goal_skeleton(text))
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Скалярное произведение нормированных разреженных векторов."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(gram, 0.0) for gram, v in a.items())
+
+
+class SemanticCache:
+    """Кэш по близости текстов: возвращает ответ для почти того же запроса"""
+
+    def __init__(self, path: Optional[Path] = None, threshold: float = 0.95, max_entries: int = 512):
+        """
+        Args:
+            path: JSONL-файл с записями (текст + результат); векторы пересчитываются при загрузке
+            threshold: Минимальная косинусная близость для попадания
+            max_entries: Максимум записей; при переполнении вытесняются самые старые
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: list = []  # (model, vector, text, result)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Читает JSONL-файл при первом обращении (битые строки пропускаются)."""
+        self._loaded = True
+        if not self.path or not self.path.exists():
+            return
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return
+        for line in lines[-self.max_entries:]:
+            try:
+                item = json.loads(line)
+                self._entries.append(
+                    (item["model"], _trigram_vector(item["text"]), item["text"], item["result"])
+                )
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def get(self, model: str, text: str) -> Optional[Dict]:
+        """
+        Копия результата самой близкой записи той же модели, если близость >= threshold
+
+        Числа в целях («в пределах 10» и «в пределах 100») должны совпадать точно:
+        триграммы различают их слишком слабо.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if not self._entries:
+                return None
+            query = _trigram_vector(text)
+            numbers = _goal_numbers(text)
+            best, best_sim = None, self.threshold
+            for entry_model, vector, entry_text, result in self._entries:
+                if entry_model != model:
+                    continue
+                sim = _cosine(query, vector)
+                if sim >= best_sim and _goal_numbers(entry_text) == numbers:
+                    best, best_sim = result, sim
+            return copy.deepcopy(best) if best is not None else None
+
+    def put(self, model: str, text: str, result: Dict):
+        """Добавляет запись и дописывает её в файл."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries.append((model, _trigram_vector(text), text, copy.deepcopy(result)))
+            overflow = len(self._entries) > self.max_entries
+            if overflow:
+                del self._entries[: len(self._entries) - self.max_entries]
+            if not self.path:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if overflow:
+                    # Переписываем файл целиком, чтобы он не рос бесконечно
+                    rows = [
+                        json.dumps({"model": m, "text": t, "result": r}, ensure_ascii=False)
+                        for m, _v, t, r in self._entries
+                    ]
+                    self.path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+                else:
+                    with self.path.open("a", encoding="utf-8") as fh:
+                        fh.write(json.dumps({"model": model, "text": text, "result": result}, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
@@ -3,79 +3,538 @@ AI Text Generator - генерация текстов анализа через
 
 Портировано из webapp/views/teacher.py с retry логикой.
 """
+import importlib.util
 import json
+import random
+import re
+import threading
 import time
-from typing import Dict, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
 
-class AITextGenerator:
-    """Генератор текстов через Qwen API"""
-    
-    SYSTEM_PROMPT = """Ты помощник учителя в Казахстане. Генерируй анализ суммативного оценивания (15-30 слов на поле).
+from .cache import CACHE_DIR, ResponseCache, SemanticCache, goal_skeleton, make_cache_key
+
+# openai (вместе с httpx и pydantic) импортируется при первой генерации, а не при старте
+# приложения: _import_openai заполняет эти имена
+httpx = None
+APIConnectionError = APIError = RateLimitError = None
+
+# Общие для всех экземпляров (генератор создаётся на каждое нажатие кнопки)
+_RESPONSE_CACHE = ResponseCache(CACHE_DIR / "llm_cache.sqlite", table="llm_cache")
+_STRUCTURAL_CACHE = ResponseCache(CACHE_DIR / "llm_cache.sqlite", table="gencache")
+_SEMANTIC_CACHE = SemanticCache(CACHE_DIR / "semantic_cache.jsonl")
+
+
+def _json_loads(content):
+    """json.loads через orjson, если он есть (ошибки — json.JSONDecodeError в обоих случаях)."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _json_dumps(obj) -> str:
+    """Компактный JSON без экранирования кириллицы."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+# Маркер пункта в начале строки затруднений: нумерация, точки, тире, звёздочки, пробелы
+_BULLET_RE = re.compile(r"^[\s0-9.\-*]+")
+
+# Казахские буквы: по ним шаблонный ответ выбирает язык
+_KK_CHARS = frozenset("әғқңөұүһіӘҒҚҢӨҰҮҺІ")
+
+# Неизменные тексты шаблонного ответа по языку:
+# (начало difficulties_list, reasons, correction)
+_FALLBACK_TEXTS = {
+    "kk": (
+        "Оқушылар мынадай тақырыптар бойынша тапсырмаларды орындау кезінде қиындықтар көрді: ",
+        "Теориялық білімді практикада қолдану дағдылары жеткіліксіз қалыптасқан. "
+        "Материалды бекіту бойынша қосымша жұмыс қажет.",
+        "Білімдегі олқылықтарды жою үшін жеке кеңестер өткізу. "
+        "Теориялық материалды қайталау және практикалық жаттығуларды орындау.",
+    ),
+    "ru": (
+        "Обучающиеся испытывали затруднения при выполнении заданий по темам: ",
+        "Недостаточно сформированы навыки применения теоретических "
+        "знаний на практике. Требуется дополнительная работа над "
+        "закреплением материала.",
+        "Провести индивидуальные консультации для устранения "
+        "пробелов в знаниях. Повторить теоретический материал и "
+        "выполнить практические упражнения.",
+    ),
+}
+
+
+class _JsonObjectEnd:
+    """Находит конец первого JSON-объекта в потоке фрагментов (скобки внутри строк не считаются)."""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> int:
+        """Индекс сразу после закрывающей «}» в text или -1, если объект ещё не закрыт."""
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    return i + 1
+        return -1
+
+
+def _collect_stream(stream) -> str:
+    """Собирает текст потокового ответа и обрывает поток, как только JSON-объект закрылся."""
+    scanner = _JsonObjectEnd()
+    parts = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            end = scanner.feed(delta)
+            if end >= 0:
+                parts.append(delta[:end])
+                break
+            parts.append(delta)
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+_BASE_URL = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+_TIMEOUT = 30.0
+# Потолок задержки между попытками (секунды)
+_MAX_BACKOFF = 30.0
+
+
+class ProviderConfig(NamedTuple):
+    """OpenAI-совместимый провайдер в цепочке генератора"""
+    model: str
+    api_key: str
+    base_url: str = _BASE_URL
+
+
+# HTTP/2 требует пакет h2; без него httpx работает по HTTP/1.1 с тем же keep-alive
+_HTTP2 = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = {"max_keepalive_connections": 16, "max_connections": 32}
+
+_http_client = None
+_http_lock = threading.Lock()
+
+
+def _shared_http_client():
+    """Общий httpx.Client: TCP/TLS-соединение с DashScope переживает отдельные генераторы."""
+    global _http_client
+    with _http_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(
+                http2=_HTTP2, limits=httpx.Limits(**_HTTP_LIMITS), timeout=_TIMEOUT
+            )
+        return _http_client
+
+
+def _import_openai():
+    """Импортирует openai и httpx; классы ошибок сохраняет в модуле для _classify_error."""
+    global httpx, APIConnectionError, APIError, RateLimitError
+    import httpx as _httpx
+    import openai
+    httpx = _httpx
+    APIConnectionError, APIError, RateLimitError = (
+        openai.APIConnectionError, openai.APIError, openai.RateLimitError
+    )
+    return openai
+
+
+def close_http_client():
+    """Закрывает общий HTTP-клиент (при выходе из приложения)."""
+    global _http_client
+    with _http_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для API провайдера
+
+    closed — запросы идут; после FAIL_THRESHOLD ошибок подряд — open: запросы
+    не отправляются COOLDOWN секунд; затем half_open — пропускается одна пробная
+    попытка: успех замыкает цепь, ошибка снова размыкает.
+    """
 
-ЯЗЫК ОТВЕТА: Сначала определи язык входных данных пользователя (казахский или русский). Отвечай СТРОГО на том же языке, на котором написаны цели обучения. Если цели на казахском — весь JSON на казахском. Если на русском — весь JSON на русском. Никогда не смешивай языки.
+    FAIL_THRESHOLD = 5
+    COOLDOWN = 60.0
 
-СТРОГО РАЗЛИЧАЙ три поля:
+    def __init__(self, fail_threshold: int = FAIL_THRESHOLD, cooldown: float = COOLDOWN):
+        self.fail_threshold = fail_threshold
+        self.cooldown = cooldown
+        self._state = "closed"
+        self._failure_count = 0
+        self._opened_at = 0.0
+        self._probe_started = None  # время начала пробной попытки в half_open
+        self._lock = threading.Lock()
 
-"difficulties_list" = ЧТО НЕ ПОЛУЧИЛОСЬ (какие темы/задания вызвали трудности)
-Пример (рус): "Учащиеся допускали ошибки при решении уравнений с дробями и построении графиков линейных функций."
-Пример (каз): "Оқушылар бөлшектермен теңдеулерді шешу және сызықтық функциялар графиктерін тұрғызу кезінде қателіктер жіберді."
+    @property
+    def state(self) -> str:
+        return self._state
 
-"reasons" = ПОЧЕМУ НЕ ПОЛУЧИЛОСЬ (причины затруднений)
-Пример (рус): "Слабо усвоены правила работы с дробями, недостаточно практики в построении координатных систем."
-Пример (каз): "Бөлшектермен жұмыс ережелері нашар меңгерілген, координаталық жүйелерді тұрғызу бойынша тәжірибе жеткіліксіз."
+    @property
+    def is_open(self) -> bool:
+        """Цепь разомкнута и время ожидания ещё не вышло"""
+        return self._state == "open" and time.monotonic() - self._opened_at < self.cooldown
 
-"correction" = ЧТО ДЕЛАТЬ (план коррекционной работы)
-Пример (рус): "Провести повторение темы 'Дроби', выполнить тренировочные упражнения по построению графиков."
-Пример (каз): "'Бөлшектер' тақырыбын қайталау, графиктерді тұрғызу бойынша жаттығу жұмыстарын орындау."
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._state = "half_open"
+                self._probe_started = None
+            # half_open: одна пробная попытка; зависшая дольше COOLDOWN не блокирует следующую
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                return False
+            self._probe_started = now
+            return True
 
-JSON формат: {"difficulties_list": "...", "reasons": "...", "correction": "..."}"""
+    def record_success(self):
+        """Успешный ответ — цепь замыкается"""
+        with self._lock:
+            self._state = "closed"
+            self._failure_count = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        """Ошибка API — счётчик растёт; на пороге (или при неудачной пробе) цепь размыкается"""
+        with self._lock:
+            self._failure_count += 1
+            if self._state == "half_open" or self._failure_count >= self.fail_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+
+# Один размыкатель на провайдера (endpoint + модель), общий для всех экземпляров генератора
+_BREAKERS: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker_for(provider: ProviderConfig) -> CircuitBreaker:
+    """Размыкатель провайдера (создаётся при первом обращении)."""
+    key = (provider.base_url, provider.model)
+    with _breakers_lock:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = _BREAKERS[key] = CircuitBreaker()
+        return breaker
+
+
+class AITextGenerator:
+    """Генератор текстов через Qwen API"""
+    
+    SYSTEM_PROMPT = """Ты помощник учителя в Казахстане. Анализ суммативного оценивания, 15-30 слов на поле.
+JSON: {"difficulties_list": ЧТО не получилось, "reasons": ПОЧЕМУ, "correction": ЧТО ДЕЛАТЬ}.
+Отвечай строго на языке целей обучения (казахский или русский), не смешивая языки."""
+    
+    # Неизменная инструкция идёт отдельным сообщением перед примерами и целями: префикс запроса
+    # (system + инструкция + примеры) одинаков у всех вызовов и попадает в кэш промптов провайдера
+    INSTRUCTIONS = """По целям обучения из каждого сообщения ниже заполни JSON:
+- difficulties_list: перечисли ЧТО не получилось
+- reasons: объясни ПОЧЕМУ не получилось
+- correction: напиши ЧТО ДЕЛАТЬ для исправления"""
+    
+    # Примеры ответов (few-shot): (достигнутые, с затруднениями, ответ) — на русском и казахском
+    FEWSHOT_EXAMPLES = (
+        (
+            "Решать линейные уравнения",
+            "Решать уравнения с дробями; строить графики линейных функций",
+            {
+                "difficulties_list": "Учащиеся допускали ошибки при решении уравнений с дробями и построении графиков линейных функций.",
+                "reasons": "Слабо усвоены правила работы с дробями, недостаточно практики в построении координатных систем.",
+                "correction": "Провести повторение темы 'Дроби', выполнить тренировочные упражнения по построению графиков.",
+            },
+        ),
+        (
+            "Сызықтық теңдеулерді шешу",
+            "Бөлшектері бар теңдеулерді шешу; сызықтық функция графигін тұрғызу",
+            {
+                "difficulties_list": "Оқушылар бөлшектермен теңдеулерді шешу және сызықтық функциялар графиктерін тұрғызу кезінде қателіктер жіберді.",
+                "reasons": "Бөлшектермен жұмыс ережелері нашар меңгерілген, координаталық жүйелерді тұрғызу бойынша тәжірибе жеткіліксіз.",
+                "correction": "'Бөлшектер' тақырыбын қайталау, графиктерді тұрғызу бойынша жаттығу жұмыстарын орындау.",
+            },
+        ),
+    )
     
     DEFAULT_MODEL = "qwen-flash-character"
 
-    def __init__(self, api_key: str, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        model: Optional[str] = None,
+        semantic_cache: bool = False,
+        providers: Optional[List[ProviderConfig]] = None
+    ):
         """
         Инициализация генератора
         
         Args:
             api_key: API ключ Qwen/DashScope
             model: Модель AI (выбирает супер-админ; по умолчанию qwen-flash-character)
+            semantic_cache: Отдавать сохранённый ответ и для почти совпадающих целей
+            providers: Цепочка провайдеров по приоритету, например
+                [основная модель, ProviderConfig("qwen-turbo", api_key),
+                 ProviderConfig("llama3.2", "ollama", "http://localhost:11434/v1")];
+                по умолчанию — только DashScope с model
         """
         self.api_key = api_key
         self.model = (model or "").strip() or self.DEFAULT_MODEL
+        self.providers = list(providers or [ProviderConfig(self.model, api_key)])
+        # Ключи кэша строятся по основной модели
+        self.model = self.providers[0].model
+        self.semantic_cache = semantic_cache
+        # Неизменные части запроса собираем один раз, а не на каждую попытку
+        self._system_msg = {"role": "system", "content": self.SYSTEM_PROMPT}
+        self._instructions_msg = {"role": "user", "content": self.INSTRUCTIONS}
+        self._fewshot = []
+        for example_achieved, example_difficulties, example_answer in self.FEWSHOT_EXAMPLES:
+            self._fewshot.append(
+                {"role": "user", "content": self._goals_prompt(example_achieved, example_difficulties)}
+            )
+            self._fewshot.append({"role": "assistant", "content": _json_dumps(example_answer)})
+        # Отпечаток всех неизменных частей промпта: правка инструкции или примеров
+        # делает прежние ответы в кэше недействительными
+        self._prompt_key = make_cache_key(
+            self.SYSTEM_PROMPT, self.INSTRUCTIONS, _json_dumps(self.FEWSHOT_EXAMPLES)
+        )
+        self._request_defaults = {
+            "response_format": {"type": "json_object"},
+            "temperature": 0.7,
+            "max_tokens": 500,
+        }
         self.client = None
-        self._init_client()
+        self._clients: List[Tuple[ProviderConfig, object]] = []
+        # Клиенты создаются при первой генерации (см. _ensure_client)
+        self._client_initialized = False
+    
+    def _ensure_client(self):
+        """Создаёт клиентов при первом обращении"""
+        if not self._client_initialized:
+            self._init_client()
+            self._client_initialized = True
     
     def _init_client(self):
-        """Инициализация OpenAI клиента"""
+        """Инициализация OpenAI клиента для каждого провайдера"""
         try:
-            from openai import OpenAI
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
-                timeout=30.0
-            )
+            openai = _import_openai()
+            for provider in self.providers:
+                self._clients.append((provider, openai.OpenAI(
+                    api_key=provider.api_key,
+                    base_url=provider.base_url,
+                    timeout=_TIMEOUT,
+                    http_client=_shared_http_client(),
+                )))
+            self.client = self._clients[0][1]
         except ImportError as e:
             raise ImportError(
                 "Библиотека openai не установлена. "
                 "Установите: pip install openai>=1.0.0"
             )
     
+    def _check_input(self, client, difficulties: str) -> Optional[Dict]:
+        """Ошибка валидации (клиент не создан, пустые затруднения) или None"""
+        if not client:
+            return {
+                "success": False,
+                "error": "AI клиент не инициализирован"
+            }
+        
+        if not difficulties.strip():
+            return {
+                "success": False,
+                "error": "Поле 'Цели с затруднениями' не может быть пустым"
+            }
+        return None
+    
+    def _cache_keys(self, achieved: str, difficulties: str) -> Tuple[str, str, str]:
+        """Ключи точного и структурного кэша и текст для семантического"""
+        cache_key = make_cache_key(self.model, self._prompt_key, achieved or "", difficulties)
+        skeleton_key = make_cache_key(
+            self.model, self._prompt_key, goal_skeleton(achieved), goal_skeleton(difficulties)
+        )
+        return cache_key, skeleton_key, f"{achieved or ''}\n{difficulties}"
+    
+    def _cache_lookup(self, keys: Tuple[str, str, str]) -> Optional[Dict]:
+        """Сохранённый ответ из кэшей (точный → структурный → семантический) или None"""
+        cache_key, skeleton_key, semantic_text = keys
+        # Те же цели уже разбирались этой моделью — отдаём сохранённый ответ без запроса к API
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+        # Те же цели с другой нумерацией/пунктуацией — тот же ответ
+        cached = _STRUCTURAL_CACHE.get(skeleton_key)
+        if cached is not None:
+            return cached
+        if self.semantic_cache:
+            return _SEMANTIC_CACHE.get(self.model, semantic_text)
+        return None
+    
+    def _cache_store(self, keys: Tuple[str, str, str], analysis: Dict):
+        """Сохраняет ответ модели во все кэши"""
+        cache_key, skeleton_key, semantic_text = keys
+        _RESPONSE_CACHE.put(cache_key, analysis)
+        _STRUCTURAL_CACHE.put(skeleton_key, analysis)
+        if self.semantic_cache:
+            _SEMANTIC_CACHE.put(self.model, semantic_text, analysis)
+    
+    @staticmethod
+    def _goals_prompt(achieved: str, difficulties: str) -> str:
+        """Текст сообщения с целями обучения"""
+        return f"""Цели обучения:
+
+Достигнутые: {achieved or 'Не указаны'}
+
+С затруднениями: {difficulties}"""
+    
+    def _build_messages(self, achieved: str, difficulties: str) -> List[Dict]:
+        """Сообщения для chat.completions: system, инструкция, примеры, цели"""
+        return [
+            self._system_msg,
+            self._instructions_msg,
+            *self._fewshot,
+            {"role": "user", "content": self._goals_prompt(achieved, difficulties)},
+        ]
+    
+    @staticmethod
+    def _parse_analysis(content: str) -> Dict:
+        """Разбор JSON-ответа модели в результат анализа"""
+        result = _json_loads(content)
+        return {
+            "success": True,
+            "difficulties_list": result.get("difficulties_list", ""),
+            "reasons": result.get("reasons", ""),
+            "correction": result.get("correction", ""),
+        }
+    
+    @staticmethod
+    def _classify_error(
+        exc: Exception, attempt: int, base_delay: float, breaker: CircuitBreaker
+    ) -> Tuple[str, Optional[float]]:
+        """
+        Текст ошибки и задержка перед следующей попыткой; ошибки API учитываются размыкателем
+        
+        Returns:
+            (last_error, delay) — delay=None означает «не повторять»
+        """
+        if isinstance(exc, json.JSONDecodeError):
+            # Не retry на ошибках парсинга
+            return f"JSON parse error: {str(exc)}", None
+        if not isinstance(exc, APIError):
+            return f"Unexpected error: {str(exc)}", base_delay
+        
+        if isinstance(exc, RateLimitError):
+            last_error, delay = f"Rate limit: {str(exc)}", base_delay * (2 ** attempt) * 2
+        elif isinstance(exc, APIConnectionError):
+            last_error, delay = f"Connection error: {str(exc)}", base_delay * (2 ** attempt)
+        else:
+            last_error, delay = f"API error: {str(exc)}", base_delay * (2 ** attempt)
+        
+        breaker.record_failure()
+        if breaker.is_open:
+            # Провайдер недоступен — дальнейшие попытки только задержат ответ
+            return f"{last_error} (circuit open)", None
+        # Полный джиттер: клиенты, получившие 429 одновременно, не повторяют запрос синхронно
+        return last_error, random.uniform(0, min(_MAX_BACKOFF, delay))
+    
+    def _try_provider(
+        self,
+        provider: ProviderConfig,
+        client,
+        messages: List[Dict],
+        max_retries: int,
+        base_delay: float,
+        deadline: float
+    ) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Запрос к одному провайдеру с retry (без пауз, выходящих за deadline по time.monotonic)
+        
+        Returns:
+            (analysis, None) при успехе или (None, last_error)
+        """
+        breaker = _breaker_for(provider)
+        if not breaker.allow():
+            return None, "circuit open"
+        
+        last_error = None
+        for attempt in range(max_retries):
+            try:
+                # Поток: ответ читается до закрытия JSON-объекта, остаток не ждём
+                stream = client.chat.completions.create(
+                    messages=messages, model=provider.model, stream=True, **self._request_defaults
+                )
+                content = _collect_stream(stream)
+                breaker.record_success()
+                return self._parse_analysis(content), None
+            
+            except Exception as e:
+                last_error, delay = self._classify_error(e, attempt, base_delay, breaker)
+                if delay is None:
+                    break
+                if attempt < max_retries - 1:
+                    if time.monotonic() + delay > deadline:
+                        break
+                    time.sleep(delay)
+        return None, last_error
+    
+    def _accept(self, provider: ProviderConfig, keys: Tuple[str, str, str], analysis: Dict) -> Dict:
+        """Отмечает провайдера в результате; в кэш попадают только ответы основной модели"""
+        analysis["provider"] = provider.model
+        # Ответ резервной модели не кэшируем: после восстановления основной цели разберёт она
+        if provider is self.providers[0]:
+            self._cache_store(keys, analysis)
+        return analysis
+    
     def generate_analysis(
         self,
         achieved: str,
         difficulties: str,
         max_retries: int = 3,
-        base_delay: float = 1.0
+        base_delay: float = 1.0,
+        overall_timeout: float = 60.0,
+        use_cache: bool = True
     ) -> Dict:
         """
-        Генерация анализа с retry логикой
+        Генерация анализа с retry логикой и переходом по цепочке провайдеров
         
         Args:
             achieved: Достигнутые цели
             difficulties: Цели с затруднениями
-            max_retries: Максимум попыток
+            max_retries: Максимум попыток на провайдера
             base_delay: Базовая задержка между попытками (секунды)
+            overall_timeout: Общий срок на все попытки и провайдеров (секунды)
+            use_cache: False — не брать ответ из кэша (повторная генерация);
+                новый ответ всё равно заменяет сохранённый
         
         Returns:
             dict: {
@@ -83,89 +542,36 @@ JSON формат: {"difficulties_list": "...", "reasons": "...", "correction":
                 "difficulties_list": str,
                 "reasons": str,
                 "correction": str,
+                "provider": str (модель, давшая ответ),
                 "error": str (если неуспешно)
             }
         """
-        if not self.client:
-            return {
-                "success": False,
-                "error": "AI клиент не инициализирован"
-            }
-        
-        if not difficulties.strip():
-            return {
-                "success": False,
-                "error": "Поле 'Цели с затруднениями' не может быть пустым"
-            }
-        
-        user_prompt = f"""Цели обучения:
-
-Достигнутые: {achieved or 'Не указаны'}
-
-С затруднениями: {difficulties}
-
-Заполни JSON:
-- difficulties_list: перечисли ЧТО не получилось
-- reasons: объясни ПОЧЕМУ не получилось  
-- correction: напиши ЧТО ДЕЛАТЬ для исправления"""
+        self._ensure_client()
+        error = self._check_input(self.client, difficulties)
+        if error:
+            return error
         
-        last_error = None
+        keys = self._cache_keys(achieved, difficulties)
+        cached = self._cache_lookup(keys) if use_cache else None
+        if cached is not None:
+            return cached
         
-        for attempt in range(max_retries):
-            try:
-                from openai import APIError, APIConnectionError, RateLimitError
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": self.SYSTEM_PROMPT},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.7,
-                    max_tokens=500,
-                )
-                
-                content = response.choices[0].message.content
-                result = json.loads(content)
-                
-                return {
-                    "success": True,
-                    "difficulties_list": result.get("difficulties_list", ""),
-                    "reasons": result.get("reasons", ""),
-                    "correction": result.get("correction", ""),
-                }
-            
-            except RateLimitError as e:
-                last_error = f"Rate limit: {str(e)}"
-                delay = base_delay * (2 ** attempt) * 2
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-            
-            except APIConnectionError as e:
-                last_error = f"Connection error: {str(e)}"
-                delay = base_delay * (2 ** attempt)
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-            
-            except APIError as e:
-                last_error = f"API error: {str(e)}"
-                delay = base_delay * (2 ** attempt)
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-            
-            except json.JSONDecodeError as e:
-                last_error = f"JSON parse error: {str(e)}"
-                # Не retry на ошибках парсинга
+        deadline = time.monotonic() + overall_timeout
+        messages = self._build_messages(achieved, difficulties)
+        errors = []
+        for provider, client in self._clients:
+            if time.monotonic() >= deadline:
+                errors.append("overall timeout")
                 break
-            
-            except Exception as e:
-                last_error = f"Unexpected error: {str(e)}"
-                if attempt < max_retries - 1:
-                    time.sleep(base_delay)
+            analysis, last_error = self._try_provider(
+                provider, client, messages, max_retries, base_delay, deadline
+            )
+            if analysis is not None:
+                return self._accept(provider, keys, analysis)
+            errors.append(f"{provider.model}: {last_error}")
         
-        # Все попытки неуспешны - возвращаем fallback
-        return self._generate_fallback(achieved, difficulties, last_error)
+        # Все провайдеры недоступны - возвращаем fallback
+        return self._generate_fallback(achieved, difficulties, "; ".join(errors))
     
     def _generate_fallback(
         self,
@@ -174,51 +580,17 @@ JSON формат: {"difficulties_list": "...", "reasons": "...", "correction":
         error: Optional[str] = None
     ) -> Dict:
         """Fallback генерация на основе шаблонов"""
-        # Определяем язык по наличию казахских букв в тексте
-        _KK_CHARS = set("әғқңөұүһіӘҒҚҢӨҰҮҺІ")
-        combined = (difficulties or "") + (achieved or "")
-        is_kk = any(c in _KK_CHARS for c in combined)
+        # Язык — по наличию казахских букв в тексте
+        lang = "kk" if not _KK_CHARS.isdisjoint((difficulties or "") + (achieved or "")) else "ru"
+        lead, reasons, correction = _FALLBACK_TEXTS[lang]
 
         # Извлекаем ключевые моменты из затруднений
-        diff_lines = [l.strip() for l in difficulties.split('\n') if l.strip()][:3]
-        diff_summary = '; '.join([
-            l.lstrip('0123456789.-* ')
-            for l in diff_lines
-        ]).lower()
-
-        if is_kk:
-            difficulties_list = (
-                f"Оқушылар мынадай тақырыптар бойынша тапсырмаларды орындау кезінде қиындықтар көрді: {diff_summary}."
-                if diff_summary else ""
-            )
-            reasons = (
-                "Теориялық білімді практикада қолдану дағдылары жеткіліксіз қалыптасқан. "
-                "Материалды бекіту бойынша қосымша жұмыс қажет."
-            )
-            correction = (
-                "Білімдегі олқылықтарды жою үшін жеке кеңестер өткізу. "
-                "Теориялық материалды қайталау және практикалық жаттығуларды орындау."
-            )
-        else:
-            difficulties_list = (
-                f"Обучающиеся испытывали затруднения при выполнении "
-                f"заданий по темам: {diff_summary}."
-                if diff_summary else ""
-            )
-            reasons = (
-                "Недостаточно сформированы навыки применения теоретических "
-                "знаний на практике. Требуется дополнительная работа над "
-                "закреплением материала."
-            )
-            correction = (
-                "Провести индивидуальные консультации для устранения "
-                "пробелов в знаниях. Повторить теоретический материал и "
-                "выполнить практические упражнения."
-            )
+        diff_lines = [_BULLET_RE.sub("", l).strip() for l in difficulties.splitlines() if l.strip()][:3]
+        diff_summary = '; '.join(diff_lines).lower()
 
         return {
             "success": True,
-            "difficulties_list": difficulties_list,
+            "difficulties_list": f"{lead}{diff_summary}." if diff_summary else "",
             "reasons": reasons,
             "correction": correction,
             "fallback": True,
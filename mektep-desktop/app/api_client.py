@@ -4,14 +4,28 @@ API Client для связи с сервером Mektep Analyzer
 HTTP клиент для авторизации, проверки подключения,
 загрузки/получения отчётов и аналитики.
 """
+import gzip
+import json
 import os
 import sys
+import threading
+import time
 import importlib
+import importlib.util
+import urllib.parse
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
 
 from .debug_log import dbg_log
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
 
 # Загружаем версию из version.py (работает и в dev-режиме, и в frozen EXE)
@@ -28,27 +42,199 @@ _DESKTOP_VERSION: str = getattr(_app_version, "APP_VERSION", "0.0.0")
 # Адрес сервера по умолчанию
 DEFAULT_SERVER_URL = "https://mektep-analyzer.kz"
 
+# Тела запросов крупнее порога (таблицы оценок) отправляются сжатыми gzip
+_GZIP_MIN_BYTES = 2048
+
+# Пул keep-alive соединений: параллельные загрузки отчётов не открывают новое TLS-соединение
+_POOL_CONNECTIONS = 4
+_POOL_MAXSIZE = 32
+
+# HTTP/2-адаптер (use_http2) требует httpx и h2; без них остаётся HTTP/1.1 keep-alive
+_HTTP2 = importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+
+def _json_dumps(obj) -> bytes:
+    """Тело JSON-запроса (orjson, если он есть; Content-Type задан в заголовках сессии)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(content: bytes):
+    """Разбор тела JSON-ответа (ошибки — ValueError в обоих случаях)."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _json_body(obj) -> Tuple[bytes, Dict[str, str]]:
+    """Тело JSON-запроса и доп. заголовки: крупное тело сжимается gzip уровня 1 (дёшево по CPU)."""
+    body = _json_dumps(obj)
+    if len(body) > _GZIP_MIN_BYTES:
+        return gzip.compress(body, compresslevel=1), {"Content-Encoding": "gzip"}
+    return body, {}
+
+
+def _error_body(content_type: str, body: bytes) -> Dict:
+    """
+    Данные тела ответа с ошибкой без повторного разбора и исключений
+    
+    JSON-объект — как есть; text/plain — {"error": первые 200 символов};
+    прочее (HTML-страница прокси и т.п.) — {}, чтобы вызывающий подставил свой текст.
+    """
+    if content_type.startswith("application/json"):
+        try:
+            data = _json_loads(body)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    if content_type.startswith("text/plain"):
+        text = body[:800].decode("utf-8", "replace").strip()[:200]
+        return {"error": text} if text else {}
+    return {}
+
+
+def _error_data(response) -> Dict:
+    """Данные тела ответа с ошибкой (requests.Response), см. _error_body."""
+    return _error_body(response.headers.get("Content-Type", ""), response.content)
+
+
+def _org_not_found(data: Dict) -> Dict:
+    """Результат для 404 «организация не найдена» (lookup_school, upload_report)"""
+    return {
+        "success": False,
+        "error": data.get("error", "Организация не найдена"),
+        "org_not_found": data.get("org_not_found", True)
+    }
+
+
+def _org_mismatch(data: Dict) -> Dict:
+    """Результат для 403 «отчёт для чужой школы» (upload_report)"""
+    return {
+        "success": False,
+        "error": data.get("error", "Создание отчётов для других школ запрещено."),
+        "org_mismatch": data.get("org_mismatch", True)
+    }
+
+
+def build_upload_payload(
+    class_name: str,
+    subject_name: str,
+    period_type: str,
+    period_number: int,
+    grades_data: Optional[Dict] = None,
+    analytics_data: Optional[Dict] = None,
+    org_name: Optional[str] = None,
+    has_quarter_grade_header: bool = False,
+) -> Dict:
+    """Тело запроса POST /api/reports/upload (общее для upload_report и пакетной загрузки)"""
+    payload = {
+        "class_name": class_name,
+        "subject_name": subject_name,
+        "period_type": period_type,
+        "period_number": period_number,
+    }
+    
+    if grades_data:
+        payload["grades_json"] = grades_data
+    if analytics_data:
+        payload["analytics_json"] = analytics_data
+    if org_name:
+        payload["org_name"] = org_name
+    if has_quarter_grade_header:
+        payload["has_quarter_grade_header"] = True
+    return payload
+
+
+class _BearerAuth(AuthBase):
+    """
+    Заголовок Authorization из текущего токена клиента
+    
+    Токен читается в момент запроса: смена токена — одна запись атрибута,
+    без правки session.headers из разных потоков. Запросы без auth
+    (health, login) уходят без заголовка.
+    """
+    
+    def __init__(self, client: "MektepAPIClient"):
+        self._client = client
+    
+    def __call__(self, r):
+        token = self._client.token
+        if token:
+            r.headers["Authorization"] = f"Bearer {token}"
+        return r
+
+
+class _ApiRetry(Retry):
+    """
+    Retry, повторяющий 429 для любого метода
+    
+    Ответ шлюза 502/503/504 на POST не повторяется: запрос мог быть обработан,
+    а /api/reports/log не идемпотентен. 429 (nginx limit_req, лимиты приложения)
+    отдаётся до обработки запроса — повтор безопасен и для POST.
+    """
+    
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
 
 class MektepAPIClient:
     """HTTP клиент для API сервера"""
     
-    def __init__(self, base_url: str = DEFAULT_SERVER_URL):
+    def __init__(self, base_url: str = DEFAULT_SERVER_URL, use_http2: bool = False):
         """
         Инициализация клиента
         
         Args:
             base_url: Базовый URL сервера
+            use_http2: HTTPS-запросы по HTTP/2 через httpx (одно мультиплексированное
+                соединение); без httpx/h2 флаг игнорируется
         """
         self.base_url = base_url.rstrip("/")
+        self._rebuild_urls()
         self.token: Optional[str] = None
         self.token_expires: Optional[datetime] = None
+        # Срок токена по time.monotonic(): не зависит от перевода системных часов
+        self._token_deadline = 0.0
         self.user_data: Optional[Dict] = None
+        # refresh_token из нескольких потоков (виджеты, финализация) выполняется по очереди
+        self._refresh_lock = threading.Lock()
+        self._auth = _BearerAuth(self)
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": f"Mektep-Analyzer/{_DESKTOP_VERSION}",
             "X-Desktop-Version": _DESKTOP_VERSION,
             "Content-Type": "application/json"
         })
+        # Повтор внутри пула urllib3 (по тем же keep-alive соединениям) при обрыве соединения,
+        # 429 и ответах шлюза 502/503/504; пауза растёт экспоненциально или берётся из Retry-After
+        retry = _ApiRetry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "DELETE"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=_POOL_CONNECTIONS,
+            pool_maxsize=_POOL_MAXSIZE,
+            pool_block=False,
+            max_retries=retry,
+        )
+        # Адаптер привязан к схеме, а не к хосту — set_base_url его не сбрасывает
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if use_http2 and _HTTP2:
+            # Повтор по статусам 429/5xx здесь не работает — только переподключение
+            from .http2_adapter import Http2Adapter
+            self.session.mount("https://", Http2Adapter(max_connections=_POOL_MAXSIZE, fallback=adapter))
+        # Очередь отчётов для пакетной загрузки (queue_upload_report / flush_uploads)
+        self.batch_size = 20
+        self._pending_uploads: List[Dict] = []
+        self._supports_batch: Optional[bool] = None  # None — сервер ещё не проверялся
     
     # ==========================================================================
     # Управление подключением
@@ -62,6 +248,27 @@ class MektepAPIClient:
             url: Новый базовый URL
         """
         self.base_url = url.rstrip("/")
+        self._rebuild_urls()
+        self._supports_batch = None
+    
+    def _rebuild_urls(self):
+        """Собирает полные URL эндпоинтов один раз на base_url, а не на каждый запрос."""
+        base = self.base_url
+        self._url_health = base + "/health/live"
+        self._url_login = base + "/api/auth/login"
+        self._url_refresh = base + "/api/auth/refresh"
+        self._url_reports_log = base + "/api/reports/log"
+        self._url_school_my = base + "/api/schools/my"
+        self._url_school_lookup = base + "/api/schools/lookup"
+        self._url_reports = base + "/api/reports/"
+        self._url_reports_upload = base + "/api/reports/upload"
+        self._url_reports_upload_batch = base + "/api/reports/upload_batch"
+        self._url_reports_all = base + "/api/reports/all"
+        self._url_reports_my = base + "/api/reports/my"
+        self._url_my_classes = base + "/api/teacher/my-classes"
+        self._url_subject_report = base + "/api/teacher/subject-report"
+        self._url_class_teacher_report = base + "/api/teacher/class-teacher-report"
+        self._url_class_grades = base + "/api/grades/class/"
     
     def check_connection(self, timeout: int = 5) -> Dict:
         """
@@ -76,15 +283,15 @@ class MektepAPIClient:
             dict: {"success": bool, "status": str, "latency_ms": int}
         """
         try:
-            start = datetime.now()
+            start = time.perf_counter_ns()
             response = self.session.get(
-                f"{self.base_url}/health/live",
+                self._url_health,
                 timeout=timeout
             )
-            latency = int((datetime.now() - start).total_seconds() * 1000)
+            latency = (time.perf_counter_ns() - start) // 1_000_000
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 return {
                     "success": True,
                     "status": data.get("status", "ok"),
@@ -112,22 +319,29 @@ class MektepAPIClient:
                 "error": f"Ошибка: {str(e)}"
             }
     
+    def warm_up(self):
+        """
+        Открыть соединение с сервером заранее (в фоновом потоке)
+        
+        HEAD /health/live кладёт в пул сессии готовое TLS-соединение, и первый
+        настоящий запрос (login) платит только за RTT, без DNS и рукопожатия.
+        Ошибки игнорируются: без сети login сам сообщит о проблеме.
+        """
+        def run():
+            try:
+                self.session.head(self._url_health, timeout=3)
+            except Exception:
+                pass
+        
+        threading.Thread(target=run, name="api-warm-up", daemon=True).start()
+    
     # ==========================================================================
     # Управление токеном
     # ==========================================================================
     
     def _is_token_valid(self) -> bool:
-        """Проверка валидности токена"""
-        if not self.token or not self.token_expires:
-            return False
-        return datetime.now() < self.token_expires
-    
-    def _set_auth_header(self):
-        """Установка заголовка авторизации"""
-        if self.token:
-            self.session.headers["Authorization"] = f"Bearer {self.token}"
-        elif "Authorization" in self.session.headers:
-            del self.session.headers["Authorization"]
+        """Проверка валидности токена (token_expires нужен только для get_token_info)"""
+        return bool(self.token) and time.monotonic() < self._token_deadline
     
     def restore_token(self, token: str, expires_iso: str, user_data: dict = None) -> bool:
         """
@@ -145,13 +359,14 @@ class MektepAPIClient:
         """
         try:
             expires = datetime.fromisoformat(expires_iso)
-            if datetime.now() >= expires:
+            remaining = (expires - datetime.now()).total_seconds()
+            if remaining <= 0:
                 return False
             
             self.token = token
             self.token_expires = expires
+            self._token_deadline = time.monotonic() + remaining
             self.user_data = user_data
-            self._set_auth_header()
             
             # Проверяем токен через refresh
             result = self.refresh_token()
@@ -161,13 +376,14 @@ class MektepAPIClient:
             # Токен невалиден — очищаем
             self.token = None
             self.token_expires = None
+            self._token_deadline = 0.0
             self.user_data = None
-            self._set_auth_header()
             return False
             
         except Exception:
             self.token = None
             self.token_expires = None
+            self._token_deadline = 0.0
             self.user_data = None
             return False
     
@@ -207,18 +423,18 @@ class MektepAPIClient:
         """
         try:
             response = self.session.post(
-                f"{self.base_url}/api/auth/login",
-                json={"username": username, "password": password},
+                self._url_login,
+                data=_json_dumps({"username": username, "password": password}),
                 timeout=10
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 self.token = data.get("token")
                 expires_in = data.get("expires_in", 2592000)  # 30 days default
                 self.token_expires = datetime.now() + timedelta(seconds=expires_in)
+                self._token_deadline = time.monotonic() + expires_in
                 self.user_data = data.get("user", {})
-                self._set_auth_header()
                 
                 return {
                     "success": True,
@@ -227,7 +443,7 @@ class MektepAPIClient:
                     "user": self.user_data
                 }
             elif response.status_code == 426:
-                data = response.json()
+                data = _error_data(response)
                 return {
                     "success": False,
                     "error": data.get("error", "Версия приложения устарела"),
@@ -237,7 +453,7 @@ class MektepAPIClient:
             else:
                 return {
                     "success": False,
-                    "error": response.json().get("error", "Неизвестная ошибка"),
+                    "error": _error_data(response).get("error", "Неизвестная ошибка"),
                     "status_code": response.status_code
                 }
         except requests.exceptions.ConnectionError:
@@ -278,54 +494,16 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool, "logged_count": int}
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            response = self.session.post(
-                f"{self.base_url}/api/reports/log",
-                json={"reports": reports},
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "logged_count": data.get("count", len(reports))
-                }
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.post(
-                        f"{self.base_url}/api/reports/log",
-                        json={"reports": reports},
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "logged_count": data.get("count", len(reports))
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка логирования отчетов"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
+        result = self._request(
+            "POST", self._url_reports_log,
+            on_success=lambda data: {
+                "success": True,
+                "logged_count": data.get("count", len(reports))
+            },
+            error="Ошибка логирования отчетов",
+            json_body={"reports": reports},
+        )
+        if result.get("offline"):
             # В автономном режиме просто сохраняем локально
             return {
                 "success": True,
@@ -333,19 +511,26 @@ class MektepAPIClient:
                 "offline": True,
                 "message": "Отчеты сохранены локально (нет подключения к серверу)"
             }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        return result
     
-    def refresh_token(self) -> Dict:
+    def refresh_token(self, stale_token: Optional[str] = None) -> Dict:
         """
         Обновление токена авторизации
         
+        Args:
+            stale_token: Токен, получивший 401; если другой поток уже заменил его,
+                повторного обновления не будет
+        
         Returns:
             dict: {"success": bool, "token": str}
         """
+        with self._refresh_lock:
+            if stale_token is not None and self.token and self.token != stale_token:
+                return {"success": True, "token": self.token}
+            return self._refresh_token_locked()
+    
+    def _refresh_token_locked(self) -> Dict:
+        """Запрос /api/auth/refresh (под self._refresh_lock)"""
         if not self.token:
             return {
                 "success": False,
@@ -353,18 +538,18 @@ class MektepAPIClient:
             }
         
         try:
-            self._set_auth_header()
             response = self.session.post(
-                f"{self.base_url}/api/auth/refresh",
+                self._url_refresh,
+                auth=self._auth,
                 timeout=10
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 self.token = data.get("token")
                 expires_in = data.get("expires_in", 2592000)
                 self.token_expires = datetime.now() + timedelta(seconds=expires_in)
-                self._set_auth_header()
+                self._token_deadline = time.monotonic() + expires_in
                 
                 return {
                     "success": True,
@@ -374,6 +559,7 @@ class MektepAPIClient:
             else:
                 self.token = None
                 self.token_expires = None
+                self._token_deadline = 0.0
                 return {
                     "success": False,
                     "error": "Не удалось обновить токен",
@@ -389,13 +575,110 @@ class MektepAPIClient:
         """Выход из системы (очистка токена и данных)"""
         self.token = None
         self.token_expires = None
+        self._token_deadline = 0.0
         self.user_data = None
-        self._set_auth_header()
     
     def is_authenticated(self) -> bool:
         """Проверка, авторизован ли пользователь"""
         return self._is_token_valid()
     
+    def _request(
+        self,
+        method: str,
+        url: str,
+        on_success: Optional[Callable[[Dict], Dict]] = None,
+        on_status: Optional[Dict[int, Callable[[Dict], Dict]]] = None,
+        error: str = "Ошибка",
+        log_401: Optional[Tuple[str, Dict, str]] = None,
+        json_body=None,
+        **kwargs
+    ) -> Dict:
+        """
+        Авторизованный запрос к API с общей обработкой ответа
+        
+        Проверяет токен; при 401 один раз обновляет токен и повторяет запрос.
+        
+        Args:
+            method: HTTP метод
+            url: Полный URL эндпоинта (self._url_*)
+            on_success: Результат по JSON ответа 200 (по умолчанию — ответ как есть)
+            on_status: Результат по JSON ответа для отдельных кодов (403, 404)
+            error: Текст ошибки, если сервер не прислал свой
+            log_401: (location, data, hypothesis) для dbg_log при 401
+            json_body: Тело запроса (сериализуется один раз, крупное — сжимается)
+            **kwargs: Аргументы session.request (params, timeout, stream)
+        
+        Returns:
+            dict: результат on_success/on_status или {"success": False, "error": str, ...}
+        """
+        if not self._is_token_valid():
+            return {
+                "success": False,
+                "error": "Токен недействителен. Требуется повторная авторизация.",
+                "needs_auth": True
+            }
+        
+        kwargs.setdefault("timeout", 15)
+        try:
+            if json_body is not None:
+                # Сериализуем один раз: тело нужно и для повтора после обновления токена
+                kwargs["data"], kwargs["headers"] = _json_body(json_body)
+            sent_token = self.token
+            response = self.session.request(method, url, auth=self._auth, **kwargs)
+            if response.status_code == 401:
+                if log_401:
+                    dbg_log(log_401[0], "401_received", log_401[1], log_401[2])
+                if self.refresh_token(stale_token=sent_token).get("success"):
+                    response.close()
+                    sent_token = self.token
+                    response = self.session.request(method, url, auth=self._auth, **kwargs)
+                if response.status_code == 401:
+                    with self._refresh_lock:
+                        # Другой поток мог уже получить новый токен — его не сбрасываем
+                        if self.token == sent_token:
+                            self.token = None
+                            self.token_expires = None
+                            self._token_deadline = 0.0
+                    return {
+                        "success": False,
+                        "error": "Токен истек. Требуется повторная авторизация.",
+                        "needs_auth": True
+                    }
+            
+            status = response.status_code
+            if status == 200:
+                if kwargs.get("stream"):
+                    # Крупный ответ разбирается прямо из сокета, без копии в response.content;
+                    # decode_content снимает gzip, после чтения соединение возвращается в пул
+                    data = _json_loads(response.raw.read(decode_content=True))
+                else:
+                    data = _json_loads(response.content)
+                return on_success(data) if on_success else data
+            data = _error_data(response)
+            if on_status and status in on_status:
+                return on_status[status](data)
+            return {
+                "success": False,
+                "error": data.get("error", error),
+                "status_code": status
+            }
+        except requests.exceptions.ConnectionError:
+            return {
+                "success": False,
+                "error": "Не удалось подключиться к серверу",
+                "offline": True
+            }
+        except requests.exceptions.Timeout:
+            return {
+                "success": False,
+                "error": "Превышено время ожидания ответа от сервера"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Ошибка: {str(e)}"
+            }
+    
     # ==========================================================================
     # School Info API (школа текущего пользователя)
     # ==========================================================================
@@ -416,39 +699,7 @@ class MektepAPIClient:
                 "iin_missing": bool,  # True если учителю не задан ИИН в БД
             }
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен."
-            }
-        
-        try:
-            self._set_auth_header()
-            response = self.session.get(
-                f"{self.base_url}/api/schools/my",
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/schools/my",
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                self.token = None
-                self.token_expires = None
-                return {"success": False, "error": "Токен истек.", "needs_auth": True}
-            else:
-                return {"success": False, "error": response.json().get("error", "Ошибка")}
-        except requests.exceptions.ConnectionError:
-            return {"success": False, "error": "Нет подключения к серверу", "offline": True}
-        except Exception as e:
-            return {"success": False, "error": f"Ошибка: {str(e)}"}
+        return self._request("GET", self._url_school_my, timeout=10)
     
     # ==========================================================================
     # School Lookup API
@@ -469,79 +720,19 @@ class MektepAPIClient:
             dict: {"success": bool, "school_id": int, "school_name": str}
                   или {"success": False, "error": str, "org_not_found": True}
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            response = self.session.get(
-                f"{self.base_url}/api/schools/lookup",
-                params={"org_name": org_name},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "school_id": data.get("school_id"),
-                    "school_name": data.get("school_name")
-                }
-            elif response.status_code == 404:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Организация не найдена"),
-                    "org_not_found": True
-                }
-            elif response.status_code == 401:
-                dbg_log("api_client:lookup_school", "401_received", {"org_name": org_name}, "H2")
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/schools/lookup",
-                        params={"org_name": org_name},
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "school_id": data.get("school_id"),
-                            "school_name": data.get("school_name")
-                        }
-                    elif response.status_code == 404:
-                        return {
-                            "success": False,
-                            "error": response.json().get("error", "Организация не найдена"),
-                            "org_not_found": True
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка поиска школы"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
-            return {
-                "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        return self._request(
+            "GET", self._url_school_lookup,
+            on_success=lambda data: {
+                "success": True,
+                "school_id": data.get("school_id"),
+                "school_name": data.get("school_name")
+            },
+            on_status={404: _org_not_found},
+            error="Ошибка поиска школы",
+            log_401=("api_client:lookup_school", {"org_name": org_name}, "H2"),
+            params={"org_name": org_name},
+            timeout=10,
+        )
     
     # ==========================================================================
     # Grade Reports API
@@ -573,115 +764,114 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool, "report_id": int, "action": "created"|"updated"}
         """
-        if not self._is_token_valid():
+        payload = build_upload_payload(
+            class_name, subject_name, period_type, period_number,
+            grades_data, analytics_data, org_name, has_quarter_grade_header,
+        )
+        return self._request(
+            "POST", self._url_reports_upload,
+            on_success=lambda data: {
+                "success": True,
+                "report_id": data.get("report_id"),
+                "action": data.get("action")
+            },
+            on_status={404: _org_not_found, 403: _org_mismatch},
+            error="Ошибка загрузки отчёта",
+            log_401=("api_client:upload_report", {"class": class_name, "subject": subject_name}, "H4"),
+            json_body=payload,
+            timeout=30,
+        )
+    
+    @staticmethod
+    def _batch_item_result(item: Dict) -> Dict:
+        """Результат элемента /api/reports/upload_batch в формате upload_report"""
+        if item.get("success"):
             return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            
-            payload = {
-                "class_name": class_name,
-                "subject_name": subject_name,
-                "period_type": period_type,
-                "period_number": period_number,
+                "success": True,
+                "report_id": item.get("report_id"),
+                "action": item.get("action")
             }
-            
-            if grades_data:
-                payload["grades_json"] = grades_data
-            if analytics_data:
-                payload["analytics_json"] = analytics_data
-            if org_name:
-                payload["org_name"] = org_name
-            if has_quarter_grade_header:
-                payload["has_quarter_grade_header"] = True
-
-            response = self.session.post(
-                f"{self.base_url}/api/reports/upload",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "report_id": data.get("report_id"),
-                    "action": data.get("action")
-                }
-            elif response.status_code == 401:
-                dbg_log(
-                    "api_client:upload_report",
-                    "401_received",
-                    {"class": class_name, "subject": subject_name},
-                    "H4",
-                )
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.post(
-                        f"{self.base_url}/api/reports/upload",
-                        json=payload,
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "report_id": data.get("report_id"),
-                            "action": data.get("action")
-                        }
-                    elif response.status_code == 404:
-                        return {
-                            "success": False,
-                            "error": response.json().get("error", "Организация не найдена"),
-                            "org_not_found": response.json().get("org_not_found", True)
-                        }
-                    elif response.status_code == 403:
-                        j = response.json()
-                        return {
-                            "success": False,
-                            "error": j.get("error", "Создание отчётов для других школ запрещено."),
-                            "org_mismatch": j.get("org_mismatch", True)
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            elif response.status_code == 404:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Организация не найдена"),
-                    "org_not_found": response.json().get("org_not_found", True)
-                }
-            elif response.status_code == 403:
-                j = response.json()
-                return {
-                    "success": False,
-                    "error": j.get("error", "Создание отчётов для других школ запрещено."),
-                    "org_mismatch": j.get("org_mismatch", True)
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка загрузки отчёта"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
+        status = item.get("status")
+        if status == 404:
             return {
                 "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
+                "error": item.get("error", "Организация не найдена"),
+                "org_not_found": item.get("org_not_found", True)
             }
-        except Exception as e:
+        if status == 403:
             return {
                 "success": False,
-                "error": f"Ошибка: {str(e)}"
+                "error": item.get("error", "Создание отчётов для других школ запрещено."),
+                "org_mismatch": item.get("org_mismatch", True)
             }
+        return {
+            "success": False,
+            "error": item.get("error", "Ошибка загрузки отчёта"),
+            "status_code": status
+        }
+    
+    def upload_reports_batch(self, items: List[Dict]) -> List[Dict]:
+        """
+        Загрузка нескольких отчётов одним запросом (POST /api/reports/upload_batch)
+        
+        Если сервер не знает пакетного эндпоинта (404), отчёты загружаются
+        по одному через upload_report; результат проверки запоминается.
+        
+        Args:
+            items: Аргументы upload_report для каждого отчёта (словари kwargs)
+        
+        Returns:
+            Результаты в формате upload_report в порядке items
+        """
+        if not items:
+            return []
+        if self._supports_batch is False:
+            return [self.upload_report(**item) for item in items]
+        
+        result = self._request(
+            "POST", self._url_reports_upload_batch,
+            on_success=lambda data: {"success": True, "results": data.get("results") or []},
+            error="Ошибка загрузки отчётов",
+            json_body={"reports": [build_upload_payload(**item) for item in items]},
+            timeout=60,
+        )
+        if result.get("status_code") == 404:
+            # Старый сервер без пакетного эндпоинта — по одному, по тому же keep-alive соединению
+            self._supports_batch = False
+            return [self.upload_report(**item) for item in items]
+        if not result.get("success"):
+            return [dict(result) for _ in items]
+        
+        self._supports_batch = True
+        results = result["results"]
+        if len(results) != len(items):
+            return [{
+                "success": False,
+                "error": "Некорректный ответ сервера на пакетную загрузку"
+            } for _ in items]
+        return [self._batch_item_result(item) for item in results]
+    
+    def queue_upload_report(self, **kwargs) -> List[Dict]:
+        """
+        Добавить отчёт в очередь пакетной загрузки (аргументы — как у upload_report)
+        
+        Returns:
+            Результаты отправленного пакета, если очередь достигла batch_size, иначе []
+        """
+        self._pending_uploads.append(kwargs)
+        if len(self._pending_uploads) >= self.batch_size:
+            return self.flush_uploads()
+        return []
+    
+    def flush_uploads(self) -> List[Dict]:
+        """
+        Отправить накопленную очередь отчётов
+        
+        Returns:
+            Результаты в порядке постановки в очередь
+        """
+        items, self._pending_uploads = self._pending_uploads, []
+        return self.upload_reports_batch(items)
     
     def delete_all_reports(self) -> Dict:
         """
@@ -692,64 +882,16 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool, "deleted_grade_reports": int, "deleted_report_files": int}
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            response = self.session.delete(
-                f"{self.base_url}/api/reports/all",
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "deleted_grade_reports": data.get("deleted_grade_reports", 0),
-                    "deleted_report_files": data.get("deleted_report_files", 0),
-                }
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.delete(
-                        f"{self.base_url}/api/reports/all",
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "deleted_grade_reports": data.get("deleted_grade_reports", 0),
-                            "deleted_report_files": data.get("deleted_report_files", 0),
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка удаления отчётов"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
-            return {
-                "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        return self._request(
+            "DELETE", self._url_reports_all,
+            on_success=lambda data: {
+                "success": True,
+                "deleted_grade_reports": data.get("deleted_grade_reports", 0),
+                "deleted_report_files": data.get("deleted_report_files", 0),
+            },
+            error="Ошибка удаления отчётов",
+            timeout=30,
+        )
     
     def delete_report(self, report_id: int) -> Dict:
         """
@@ -761,74 +903,15 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool}
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            response = self.session.delete(
-                f"{self.base_url}/api/reports/{report_id}",
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                return {"success": True}
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.delete(
-                        f"{self.base_url}/api/reports/{report_id}",
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        return {"success": True}
-                    elif response.status_code == 403:
-                        return {
-                            "success": False,
-                            "error": "Нет прав для удаления этого отчёта"
-                        }
-                    elif response.status_code == 404:
-                        return {
-                            "success": False,
-                            "error": "Отчёт не найден"
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            elif response.status_code == 403:
-                return {
-                    "success": False,
-                    "error": "Нет прав для удаления этого отчёта"
-                }
-            elif response.status_code == 404:
-                return {
-                    "success": False,
-                    "error": "Отчёт не найден"
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка удаления отчёта"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
-            return {
-                "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        return self._request(
+            "DELETE", self._url_reports + str(report_id),
+            on_success=lambda data: {"success": True},
+            on_status={
+                403: lambda data: {"success": False, "error": "Нет прав для удаления этого отчёта"},
+                404: lambda data: {"success": False, "error": "Отчёт не найден"},
+            },
+            error="Ошибка удаления отчёта",
+        )
     
     def get_my_reports(
         self,
@@ -859,71 +942,22 @@ class MektepAPIClient:
                 ]
             }
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
+        params = {}
+        if period_type:
+            params["period_type"] = period_type
+        if period_number:
+            params["period_number"] = period_number
         
-        try:
-            self._set_auth_header()
-            
-            params = {}
-            if period_type:
-                params["period_type"] = period_type
-            if period_number:
-                params["period_number"] = period_number
-            
-            response = self.session.get(
-                f"{self.base_url}/api/reports/my",
-                params=params,
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "reports": data.get("reports", [])
-                }
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/reports/my",
-                        params=params,
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "reports": data.get("reports", [])
-                        }
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка получения отчётов"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
-            return {
-                "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        return self._request(
+            "GET", self._url_reports_my,
+            on_success=lambda data: {
+                "success": True,
+                "reports": data.get("reports", [])
+            },
+            error="Ошибка получения отчётов",
+            params=params,
+            stream=True,
+        )
     
     def get_my_classes(self) -> Dict:
         """
@@ -936,35 +970,7 @@ class MektepAPIClient:
                 "managed_classes": ["7А", ...]
             }
         """
-        if not self._is_token_valid():
-            return {"success": False, "error": "Токен недействителен.", "needs_auth": True}
-        
-        try:
-            self._set_auth_header()
-            response = self.session.get(
-                f"{self.base_url}/api/teacher/my-classes",
-                timeout=15
-            )
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/teacher/my-classes",
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                self.token = None
-                self.token_expires = None
-                return {"success": False, "error": "Токен истек.", "needs_auth": True}
-            else:
-                return {"success": False, "error": response.json().get("error", "Ошибка")}
-        except requests.exceptions.ConnectionError:
-            return {"success": False, "error": "Нет подключения к серверу", "offline": True}
-        except Exception as e:
-            return {"success": False, "error": f"Ошибка: {str(e)}"}
+        return self._request("GET", self._url_my_classes)
     
     def get_subject_report(
         self,
@@ -977,37 +983,12 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool, "subjects": [...]}
         """
-        if not self._is_token_valid():
-            return {"success": False, "error": "Токен недействителен.", "needs_auth": True}
-        
-        try:
-            self._set_auth_header()
-            response = self.session.get(
-                f"{self.base_url}/api/teacher/subject-report",
-                params={"period_number": period_number},
-                timeout=30
-            )
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/teacher/subject-report",
-                        params={"period_number": period_number},
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                self.token = None
-                self.token_expires = None
-                return {"success": False, "error": "Токен истек.", "needs_auth": True}
-            else:
-                return {"success": False, "error": response.json().get("error", "Ошибка")}
-        except requests.exceptions.ConnectionError:
-            return {"success": False, "error": "Нет подключения к серверу", "offline": True}
-        except Exception as e:
-            return {"success": False, "error": f"Ошибка: {str(e)}"}
+        return self._request(
+            "GET", self._url_subject_report,
+            params={"period_number": period_number},
+            timeout=30,
+            stream=True,
+        )
     
     def get_class_teacher_report(
         self,
@@ -1020,37 +1001,12 @@ class MektepAPIClient:
         Returns:
             dict: {"success": bool, "classes": [...]}
         """
-        if not self._is_token_valid():
-            return {"success": False, "error": "Токен недействителен.", "needs_auth": True}
-        
-        try:
-            self._set_auth_header()
-            response = self.session.get(
-                f"{self.base_url}/api/teacher/class-teacher-report",
-                params={"period_number": period_number},
-                timeout=30
-            )
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/teacher/class-teacher-report",
-                        params={"period_number": period_number},
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                self.token = None
-                self.token_expires = None
-                return {"success": False, "error": "Токен истек.", "needs_auth": True}
-            else:
-                return {"success": False, "error": response.json().get("error", "Ошибка")}
-        except requests.exceptions.ConnectionError:
-            return {"success": False, "error": "Нет подключения к серверу", "offline": True}
-        except Exception as e:
-            return {"success": False, "error": f"Ошибка: {str(e)}"}
+        return self._request(
+            "GET", self._url_class_teacher_report,
+            params={"period_number": period_number},
+            timeout=30,
+            stream=True,
+        )
     
     def get_class_grades(
         self,
@@ -1079,57 +1035,11 @@ class MektepAPIClient:
                 }
             }
         """
-        if not self._is_token_valid():
-            return {
-                "success": False,
-                "error": "Токен недействителен. Требуется повторная авторизация."
-            }
-        
-        try:
-            self._set_auth_header()
-            
-            import urllib.parse
-            encoded_class = urllib.parse.quote(class_name, safe='')
-            
-            response = self.session.get(
-                f"{self.base_url}/api/grades/class/{encoded_class}",
-                params={"period_number": period_number},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                refresh_result = self.refresh_token()
-                if refresh_result.get("success"):
-                    response = self.session.get(
-                        f"{self.base_url}/api/grades/class/{encoded_class}",
-                        params={"period_number": period_number},
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                self.token = None
-                self.token_expires = None
-                return {
-                    "success": False,
-                    "error": "Токен истек. Требуется повторная авторизация.",
-                    "needs_auth": True
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("error", "Ошибка получения данных класса"),
-                    "status_code": response.status_code
-                }
-        except requests.exceptions.ConnectionError:
-            return {
-                "success": False,
-                "error": "Не удалось подключиться к серверу",
-                "offline": True
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Ошибка: {str(e)}"
-            }
+        encoded_class = urllib.parse.quote(class_name, safe='')
+        return self._request(
+            "GET", self._url_class_grades + encoded_class,
+            error="Ошибка получения данных класса",
+            params={"period_number": period_number},
+            timeout=30,
+            stream=True,
+        )
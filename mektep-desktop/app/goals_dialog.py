@@ -65,6 +65,9 @@ class GoalsDialog(QDialog):
         # Словари для хранения виджетов
         self.goals_widgets = {}  # {sor_type: {"achieved": QTextEdit, "difficulties": QTextEdit}}
         self.analysis_widgets = {}  # {(row_type, sor_type): QTextEdit}
+        # Последние сгенерированные цели по вкладкам: повторное нажатие с теми же
+        # целями запрашивает новый вариант, а не ответ из кэша
+        self._generated_goals = {}  # {sor_type: (achieved, difficulties)}
         
         self.init_ui()
     
@@ -450,12 +453,19 @@ class GoalsDialog(QDialog):
         
         try:
             from ai.text_generator import AITextGenerator
-            generator = AITextGenerator(api_key, model=ai_model)
-            result = generator.generate_analysis(achieved, difficulties)
+            # ai/semantic_cache — отдавать сохранённый ответ и для почти совпадающих целей
+            generator = AITextGenerator(
+                api_key,
+                model=ai_model,
+                semantic_cache=self.settings.value("ai/semantic_cache", False, type=bool),
+            )
+            regenerate = self._generated_goals.get(sor_type) == (achieved, difficulties)
+            result = generator.generate_analysis(achieved, difficulties, use_cache=not regenerate)
             
             QApplication.restoreOverrideCursor()
             
             if result.get("success"):
+                self._generated_goals[sor_type] = (achieved, difficulties)
                 # Заполняем соответствующие ячейки в таблице анализа
                 self.analysis_widgets[("difficulties_list", sor_type)].setText(
                     result.get("difficulties_list", "")
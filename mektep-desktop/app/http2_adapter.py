@@ -0,0 +1,162 @@
+"""
+HTTP/2-транспорт для requests.Session на базе httpx
+
+Http2Adapter монтируется на https:// вместо HTTPAdapter: все запросы к серверу
+(в том числе одновременные из разных потоков) идут потоками одного TLS-соединения. Остальной код MektepAPIClient не меняется — auth, stream,
+таймауты, verify/cert и исключения requests работают как с обычным адаптером.
+Запросы через прокси (в том числе из переменных окружения) адаптер передаёт
+обычному HTTPAdapter.
+
+Требует пакеты httpx и h2 (httpx приходит вместе с openai).
+"""
+import os
+import ssl
+import threading
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, get_encoding_from_headers, select_proxy
+
+# Заголовки HTTP/1.1-соединения запрещены в HTTP/2 (h2 отклоняет такой запрос)
+_HOP_BY_HOP = frozenset(["connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"])
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    """SSL-контекст с той же семантикой verify/cert, что у HTTPAdapter"""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        ca_bundle = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(ca_bundle):
+            context = ssl.create_default_context(capath=ca_bundle)
+        else:
+            context = ssl.create_default_context(cafile=ca_bundle)
+    if cert:
+        if isinstance(cert, (tuple, list)):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    return context
+
+
+class _HttpxRaw:
+    """Файлоподобный response.raw поверх потокового ответа httpx"""
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self._chunks = None
+        self._buffer = b""
+
+    def read(self, amt: Optional[int] = None, decode_content: bool = True) -> bytes:
+        if self._chunks is None:
+            # Режим выбирается при первом чтении: распакованное тело или как пришло
+            self._chunks = self._response.iter_bytes() if decode_content else self._response.iter_raw()
+        if amt is None:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            self.close()
+            return data
+        while len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        if not data:
+            self.close()
+        return data
+
+    def close(self):
+        self._response.close()
+
+    release_conn = close
+
+
+class Http2Adapter(BaseAdapter):
+    """Адаптер requests, отправляющий запросы через httpx.Client(http2=True)"""
+
+    def __init__(self, max_connections: int = 32, retries: int = 3,
+                 fallback: Optional[HTTPAdapter] = None):
+        """
+        Args:
+            max_connections: Максимум соединений (по HTTP/2 обычно хватает одного)
+            retries: Повторы при ошибке установки соединения (статусы 5xx не повторяются)
+            fallback: Адаптер для запросов через прокси (по умолчанию HTTPAdapter())
+        """
+        super().__init__()
+        self._max_connections = max_connections
+        self._retries = retries
+        self._fallback = fallback or HTTPAdapter()
+        # Транспорт httpx фиксирует SSL-настройки, поэтому клиент — на каждую пару verify/cert
+        self._clients: Dict[tuple, httpx.Client] = {}
+        self._lock = threading.Lock()
+
+    def _client_for(self, verify, cert) -> httpx.Client:
+        key = (verify, tuple(cert) if isinstance(cert, list) else cert)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = httpx.Client(
+                    transport=httpx.HTTPTransport(
+                        verify=_ssl_context(verify, cert),
+                        http2=True,
+                        retries=self._retries,
+                        limits=httpx.Limits(max_connections=self._max_connections),
+                    ),
+                )
+                self._clients[key] = client
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if select_proxy(request.url, proxies):
+            return self._fallback.send(
+                request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies,
+            )
+        client = self._client_for(verify, cert)
+        headers = [
+            (name, value) for name, value in request.headers.items()
+            if name.lower() not in _HOP_BY_HOP
+        ]
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        else:
+            timeout = httpx.Timeout(timeout)
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        try:
+            response = client.send(
+                client.build_request(
+                    request.method, request.url, headers=headers, content=body, timeout=timeout,
+                ),
+                stream=True,
+            )
+        except httpx.TimeoutException as e:
+            if isinstance(e, httpx.ConnectTimeout):
+                raise requests.exceptions.ConnectTimeout(e, request=request)
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.reason = response.reason_phrase
+        result.headers = CaseInsensitiveDict(response.headers)
+        result.encoding = get_encoding_from_headers(result.headers)
+        result.raw = _HttpxRaw(response)
+        result.url = request.url
+        result.request = request
+        result.connection = self
+        if not stream:
+            result.content  # читаем тело сразу, как HTTPAdapter без stream
+        return result
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+        self._fallback.close()
@@ -65,6 +65,8 @@ class LoginDialog(QDialog):
         
         self.init_ui()
         self.load_saved_credentials()
+        # Пока пользователь вводит пароль, соединение с сервером уже устанавливается
+        self.api_client.warm_up()
     
     def init_ui(self):
         """Инициализация интерфейса"""
@@ -46,6 +46,8 @@ class ReportFinalizer:
         self._scraped_org_name: Optional[str] = None
         self._org_upload_allowed = True
         self._server_school_name: Optional[str] = None
+        # Отчёты, ожидающие пакетной загрузки: (report_data, аргументы upload_report, final_excel, kind)
+        self._uploads: List[Tuple[Dict[str, Any], Dict[str, Any], Optional[Path], str]] = []
 
     def finalize_reports(self) -> List[Dict[str, Any]]:
         """
@@ -156,6 +158,7 @@ class ReportFinalizer:
             )
 
         if batch_subdirs:
+            self._uploads = []
             for subdir in batch_subdirs:
                 try:
                     report_data = self._process_batch_subdir(
@@ -166,6 +169,7 @@ class ReportFinalizer:
                 except Exception as e:
                     print(f"[DEBUG] Ошибка обработки {subdir.name}: {e}")
                     continue
+            self._flush_uploads()
         else:
             reports = self._finalize_from_excel_files(final_reports_dir, period_name)
 
@@ -310,90 +314,139 @@ class ReportFinalizer:
                     report_data["upload_skip_reason"] = "no_grade_table"
                     return report_data
 
-                upload_result = self.api_client.upload_report(
-                    class_name=class_name,
-                    subject_name=subject_name,
-                    period_type=period_type,
-                    period_number=period_number,
-                    grades_data=grades_data,
-                    analytics_data=analytics_data,
-                    org_name=self._scraped_org_name,
-                    has_quarter_grade_header=has_quarter_grade_header(subdir),
-                )
-                dbg_log(
-                    "report_finalization:_process_batch_subdir",
-                    "upload_result",
+                self._uploads.append((
+                    report_data,
                     {
-                        "class": class_name,
-                        "subject": subject_name,
-                        "success": upload_result.get("success"),
-                        "needs_auth": upload_result.get("needs_auth"),
-                        "report_id": upload_result.get("report_id"),
-                        "action": upload_result.get("action"),
+                        "class_name": class_name,
+                        "subject_name": subject_name,
+                        "period_type": period_type,
+                        "period_number": period_number,
+                        "grades_data": grades_data,
+                        "analytics_data": analytics_data,
+                        "org_name": self._scraped_org_name,
+                        "has_quarter_grade_header": has_quarter_grade_header(subdir),
                     },
-                    "H4",
-                )
-                if upload_result.get("needs_auth"):
-                    refresh_result = self.api_client.refresh_token()
-                    if refresh_result.get("success"):
-                        upload_result = self.api_client.upload_report(
-                            class_name=class_name,
-                            subject_name=subject_name,
-                            period_type=period_type,
-                            period_number=period_number,
-                            grades_data=grades_data,
-                            analytics_data=analytics_data,
-                            org_name=self._scraped_org_name,
-                            has_quarter_grade_header=has_quarter_grade_header(subdir),
-                        )
-                        dbg_log(
-                            "report_finalization:_process_batch_subdir",
-                            "upload_retry",
-                            {
-                                "class": class_name,
-                                "subject": subject_name,
-                                "success": upload_result.get("success"),
-                                "report_id": upload_result.get("report_id"),
-                                "action": upload_result.get("action"),
-                            },
-                            "H4",
-                        )
-                if upload_result.get("success"):
-                    report_data["server_report_id"] = upload_result.get("report_id")
-                    if final_excel:
-                        self._save_report_metadata(
-                            final_excel,
-                            upload_result.get("report_id"),
-                            class_name,
-                            subject_name,
-                            period_type,
-                            period_number,
-                        )
-                    print(
-                        f"[DEBUG] Отчёт загружен: {class_name} {subject_name} "
-                        f"-> ID {upload_result.get('report_id')} ({upload_result.get('action')})"
-                    )
-                elif upload_result.get("org_not_found"):
-                    print(
-                        f"[DEBUG] Сервер: организация не найдена. "
-                        f"Отчёт сохранён только локально: {class_name} {subject_name}"
-                    )
-                    report_data["upload_skipped"] = True
-                    report_data["upload_skip_reason"] = "org_not_found_server"
-                elif upload_result.get("org_mismatch"):
-                    print(
-                        f"[DEBUG] Сервер: создание отчётов для других школ запрещено. "
-                        f"Включите «Отчёты для других школ» в настройках: {class_name} {subject_name}"
-                    )
-                    report_data["upload_skipped"] = True
-                    report_data["upload_skip_reason"] = "org_mismatch"
-                else:
-                    print(f"[DEBUG] Ошибка загрузки: {upload_result.get('error')}")
+                    final_excel,
+                    "criteria",
+                ))
         except Exception as e:
             print(f"[DEBUG] Ошибка при загрузке на сервер: {e}")
 
         return report_data
 
+    def _flush_uploads(self) -> None:
+        """
+        Загрузка накопленных отчётов пакетами (queue_upload_report / flush_uploads).
+
+        Отчёты, отклонённые из-за истёкшего токена, один раз повторяются после refresh.
+        """
+        uploads, self._uploads = self._uploads, []
+        if not uploads:
+            return
+        try:
+            results: List[Dict[str, Any]] = []
+            for _report_data, kwargs, _excel, _kind in uploads:
+                results.extend(self.api_client.queue_upload_report(**kwargs))
+            results.extend(self.api_client.flush_uploads())
+            if len(results) != len(uploads):
+                raise ValueError("число результатов не совпадает с числом отчётов")
+
+            retry = [i for i, result in enumerate(results) if result.get("needs_auth")]
+            if retry and self.api_client.refresh_token().get("success"):
+                retried = self.api_client.upload_reports_batch([uploads[i][1] for i in retry])
+                for i, result in zip(retry, retried):
+                    results[i] = result
+                    dbg_log(
+                        "report_finalization:_flush_uploads",
+                        "upload_retry",
+                        {
+                            "class": uploads[i][1]["class_name"],
+                            "subject": uploads[i][1]["subject_name"],
+                            "success": result.get("success"),
+                            "report_id": result.get("report_id"),
+                            "action": result.get("action"),
+                        },
+                        "H4",
+                    )
+        except Exception as e:
+            print(f"[DEBUG] Ошибка при загрузке на сервер: {e}")
+            results = [{"success": False, "error": str(e), "exception": True} for _ in uploads]
+
+        for (report_data, kwargs, final_excel, kind), result in zip(uploads, results):
+            if kind == "final":
+                self._apply_final_upload_result(report_data, result)
+            else:
+                self._apply_upload_result(report_data, kwargs, final_excel, result)
+
+    def _apply_upload_result(
+        self,
+        report_data: Dict[str, Any],
+        upload: Dict[str, Any],
+        final_excel: Optional[Path],
+        upload_result: Dict[str, Any],
+    ) -> None:
+        """Отметка результата загрузки отчёта по критериям в report_data (+ .meta.json)."""
+        class_name = upload["class_name"]
+        subject_name = upload["subject_name"]
+        dbg_log(
+            "report_finalization:_apply_upload_result",
+            "upload_result",
+            {
+                "class": class_name,
+                "subject": subject_name,
+                "success": upload_result.get("success"),
+                "needs_auth": upload_result.get("needs_auth"),
+                "report_id": upload_result.get("report_id"),
+                "action": upload_result.get("action"),
+            },
+            "H4",
+        )
+        if upload_result.get("exception"):
+            return
+        if upload_result.get("success"):
+            report_data["server_report_id"] = upload_result.get("report_id")
+            if final_excel:
+                self._save_report_metadata(
+                    final_excel,
+                    upload_result.get("report_id"),
+                    class_name,
+                    subject_name,
+                    upload["period_type"],
+                    upload["period_number"],
+                )
+            print(
+                f"[DEBUG] Отчёт загружен: {class_name} {subject_name} "
+                f"-> ID {upload_result.get('report_id')} ({upload_result.get('action')})"
+            )
+        elif upload_result.get("org_not_found"):
+            print(
+                f"[DEBUG] Сервер: организация не найдена. "
+                f"Отчёт сохранён только локально: {class_name} {subject_name}"
+            )
+            report_data["upload_skipped"] = True
+            report_data["upload_skip_reason"] = "org_not_found_server"
+        elif upload_result.get("org_mismatch"):
+            print(
+                f"[DEBUG] Сервер: создание отчётов для других школ запрещено. "
+                f"Включите «Отчёты для других школ» в настройках: {class_name} {subject_name}"
+            )
+            report_data["upload_skipped"] = True
+            report_data["upload_skip_reason"] = "org_mismatch"
+        else:
+            print(f"[DEBUG] Ошибка загрузки: {upload_result.get('error')}")
+
+    def _apply_final_upload_result(self, report_data: Dict[str, Any], upload_result: Dict[str, Any]) -> None:
+        """Отметка результата загрузки итоговых оценок в report_data."""
+        if upload_result.get("exception"):
+            report_data["upload_skipped"] = True
+            report_data["upload_skip_reason"] = "exception"
+        elif upload_result.get("success"):
+            report_data["server_report_id"] = upload_result.get("report_id")
+            report_data["upload_action"] = upload_result.get("action")
+        else:
+            report_data["upload_skipped"] = True
+            report_data["upload_skip_reason"] = upload_result.get("error", "upload_failed")
+
     def _finalize_from_excel_files(
         self, final_reports_dir: Path, period_name: str
     ) -> List[Dict[str, Any]]:
@@ -517,21 +570,20 @@ class ReportFinalizer:
                 report_data["upload_skip_reason"] = "period_skip"
                 return report_data
 
-            upload_result = self.api_client.upload_report(
-                class_name=class_name,
-                subject_name=subject_name,
-                period_type=period_type,
-                period_number=period_number,
-                grades_data=grades_data,
-                analytics_data=None,
-                org_name=self._scraped_org_name,
-            )
-            if upload_result.get("success"):
-                report_data["server_report_id"] = upload_result.get("report_id")
-                report_data["upload_action"] = upload_result.get("action")
-            else:
-                report_data["upload_skipped"] = True
-                report_data["upload_skip_reason"] = upload_result.get("error", "upload_failed")
+            self._uploads.append((
+                report_data,
+                {
+                    "class_name": class_name,
+                    "subject_name": subject_name,
+                    "period_type": period_type,
+                    "period_number": period_number,
+                    "grades_data": grades_data,
+                    "analytics_data": None,
+                    "org_name": self._scraped_org_name,
+                },
+                None,
+                "final",
+            ))
         except Exception as e:
             print(f"[DEBUG] Ошибка загрузки итога: {e}")
             report_data["upload_skipped"] = True
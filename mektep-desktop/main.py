@@ -32,6 +32,13 @@ def _get_icon_path() -> Path:
     return base / "resources" / "icons" / "app_icon.ico"
 
 
+def _close_ai_http_client():
+    """Закрывает общий HTTP-клиент AI-генератора, если генерация запускалась."""
+    text_generator = sys.modules.get("ai.text_generator")
+    if text_generator is not None:
+        text_generator.close_http_client()
+
+
 def main():
     """Запуск приложения"""
     # Устанавливаем AppUserModelID для корректного отображения иконки в панели задач Windows
@@ -42,6 +49,7 @@ def main():
         pass  # Не Windows — пропускаем
     
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(_close_ai_http_client)
     
     # Установка стиля приложения
     app.setStyle("Fusion")
@@ -78,8 +86,10 @@ def main():
     # Загружаем URL сервера из настроек
     server_url = settings.value("server/url", DEFAULT_SERVER_URL)
     
-    # API клиент (подключение к настроенному серверу)
-    api_client = MektepAPIClient(server_url)
+    # API клиент (подключение к настроенному серверу); server/http2 — HTTP/2 через httpx
+    api_client = MektepAPIClient(
+        server_url, use_http2=settings.value("server/http2", False, type=bool)
+    )
     
     # Показываем окно логина
     login_dialog = LoginDialog(api_client)
@@ -1,22 +1,54 @@
 """Сборка Excel-отчёта из JSON по шаблону: формативное оценивание, СОР, СОЧ, лист «Оценки»."""
 import argparse
 import json
+import mmap
 import re
+from copy import copy
+from functools import lru_cache
 from pathlib import Path
 
 from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+# Индексы колонок шаблона: ws.cell(row, column) не разбирает A1-координату на каждую запись.
+_COL = {letter: column_index_from_string(letter) for letter in "ABCDEFGHIJKLMN"}
+
+# Уровни учащегося на листе шаблона: 0 — «5» (≥85%), 1 — «4» (65–85%), 2 — «3» (40–65%), 3 — «2» (<40%);
+# _LEVEL_NONE — оценка вне 2–5 в режиме «grade». Флаги пишутся в F–I, ФИО — в одну из колонок L/M/N.
+_LEVEL_NONE = 4
+_LEVEL_FLAGS = ((1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1), (0, 0, 0, 0))
+_LEVEL_NAME_SLOT = (0, 1, 1, 2, None)
+_GRADE_LEVEL = {5: 0, 4: 1, 3: 2, 2: 3}
+_FLAG_COLS = tuple(_COL[col] for col in "FGHI")
+_NAME_COLS = tuple(_COL[col] for col in "LMN")
+
+# Значения average/grade, которые не считаются данными (страница без них не создаётся).
+_EMPTY_MARKS = frozenset({None, "", "0", 0})
+
+_FILENAME_BAD_CHARS_RE = re.compile(r"[<>:\"/\\\\|?*]+")
+_CLASS_LITER_RE = re.compile(r"(\d+)\s*([A-Za-zА-ЯЁӘҒҚҢӨҰҮҺа-яёәғқңөұүһ])?")
+
+# «85%» → «85», «4,5» → «4.5» за один проход str.translate.
+_NUMBER_TRANS = str.maketrans({"%": None, ",": "."})
 
 
 def _sanitize_filename(s: str) -> str:
     """Очищает строку для имени файла: убирает недопустимые символы Windows."""
     s = " ".join((s or "").split()).strip()
-    s = re.sub(r"[<>:\"/\\\\|?*]+", "_", s)
+    s = _FILENAME_BAD_CHARS_RE.sub("_", s)
     s = s.strip(" .")
     return s or "report"
 
 
 def _load_json(path: Path):
-    """Читает JSON-файл в UTF-8 и возвращает объект Python."""
+    """Читает JSON-файл в UTF-8 и возвращает объект Python (orjson разбирает байты без отдельного декодирования)."""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
     return json.loads(path.read_text(encoding="utf-8"))
 
 
@@ -24,24 +56,26 @@ def _points_by_section(points: dict, quarter_num: int) -> dict[int, str]:
     """Из словаря баллов по ключам `chetvert_{q}_razdel_{k}_...` берёт значения по номеру раздела k."""
     out: dict[int, str] = {}
     prefix = f"chetvert_{quarter_num}_razdel_"
+    prefix_len = len(prefix)
     for pid, val in (points or {}).items():
         if not isinstance(pid, str) or not pid.startswith(prefix):
             continue
-        parts = pid.split("_")
-        # chetvert_{q}_razdel_{k}_{row}
-        if len(parts) >= 5 and parts[2] == "razdel":
-            try:
-                sec = int(parts[3])
-            except Exception:
-                continue
-            out[sec] = val
+        # chetvert_{q}_razdel_{k}_{row}: after the prefix only «{k}_…» is needed.
+        sec_s, sep, _ = pid[prefix_len:].partition("_")
+        if not sep:
+            continue
+        try:
+            sec = int(sec_s)
+        except Exception:
+            continue
+        out[sec] = val
     return out
 
 
 def _parse_class_liter(class_text: str) -> str:
     """Преобразует текст класса («5 «В»») в короткий вид для листа (например «5В»)."""
     s = (class_text or "").replace("«", " ").replace("»", " ").strip()
-    m = re.search(r"(\d+)\s*([A-Za-zА-ЯЁӘҒҚҢӨҰҮҺа-яёәғқңөұүһ])?", s)
+    m = _CLASS_LITER_RE.search(s)
     if not m:
         return (class_text or "").strip()
     num = m.group(1)
@@ -55,35 +89,142 @@ def _to_number(val):
         return 0.0
     if isinstance(val, (int, float)):
         return float(val)
-    s = str(val).strip().replace("%", "").replace(",", ".")
+    return _to_number_str(str(val))
+
+
+@lru_cache(maxsize=4096)
+def _to_number_str(s: str) -> float:
+    """Строковая часть _to_number; значения в ячейках сильно повторяются («», «0», «5»), поэтому кэшируется."""
+    s = s.strip().translate(_NUMBER_TRANS)
     try:
         return float(s) if s else 0.0
     except Exception:
         return 0.0
 
 
+def _percent_level(percent: float) -> int:
+    """Уровень учащегося (индекс в _LEVEL_FLAGS) по проценту выполнения."""
+    if percent >= 85:
+        return 0
+    if percent >= 65:
+        return 1
+    if percent >= 40:
+        return 2
+    return 3
+
+
+@lru_cache(maxsize=8)
+def _max_points_re(quarter_num: int) -> re.Pattern:
+    """Байтовая регулярка полей макс. балла разделов четверти в criteria.html (кэш по номеру четверти)."""
+    return re.compile(rb'id="chetvert_%d_razdel_(\d+)_max"[^>]*\svalue="([^"]+)"' % quarter_num, re.IGNORECASE)
+
+
 def _extract_max_points_from_criteria_html(criteria_html: Path, quarter_num: int) -> dict[int, int]:
-    """Запасной вариант: парсит макс. баллы по разделам из сохранённого criteria.html (атрибуты max)."""
+    """Запасной вариант: парсит макс. баллы по разделам из сохранённого criteria.html (атрибуты max).
+
+    Файл не декодируется в строку целиком: регулярка идёт по байтам через mmap.
+    """
     if not criteria_html.exists():
         return {}
-    html = criteria_html.read_text(encoding="utf-8", errors="ignore")
     out: dict[int, int] = {}
-    pattern = re.compile(rf'id="chetvert_{quarter_num}_razdel_(\d+)_max"[^>]*\svalue="([^"]+)"', re.IGNORECASE)
-    for sec_s, val_s in pattern.findall(html):
+    with criteria_html.open("rb") as f:
         try:
-            sec = int(sec_s)
-            val = int(float(val_s.strip()))
-            out[sec] = val
-        except Exception:
-            continue
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл не отображается в память.
+            return {}
+        with mm:
+            for m in _max_points_re(quarter_num).finditer(mm):
+                try:
+                    sec = int(m.group(1))
+                    val = int(float(m.group(2).decode("ascii", errors="ignore").strip()))
+                    out[sec] = val
+                except Exception:
+                    continue
     return out
 
 
 def _clear_rows(ws, start_row: int, end_row: int, cols: list[str]):
     """Обнуляет ячейки в диапазоне строк по указанным колонкам."""
+    col_idx = [_COL[col] for col in cols]
     for r in range(start_row, end_row + 1):
-        for col in cols:
-            ws[f"{col}{r}"].value = None
+        for c in col_idx:
+            ws.cell(row=r, column=c).value = None
+
+
+def _new_page(wb, template_ws, title: str):
+    """Создаёт лист отчёта из листа-шаблона (замена wb.copy_worksheet).
+
+    Значения и стили ячеек копируются, а объекты размеров строк и колонок разделяются
+    с шаблоном: в Шаблон.xlsx их ~1000, и их глубокое копирование было основной
+    стоимостью copy_worksheet. Отчёт размеры не меняет, поэтому общие объекты безопасны.
+    """
+    ws = wb.create_sheet(title=title[:31])
+    for (row, col), src in template_ws._cells.items():
+        cell = ws.cell(row=row, column=col)
+        cell._value = src._value
+        cell.data_type = src.data_type
+        if src.has_style:
+            cell._style = copy(src._style)
+        if src.hyperlink:
+            cell._hyperlink = copy(src.hyperlink)
+        if src.comment:
+            cell.comment = copy(src.comment)
+    ws.row_dimensions.update(template_ws.row_dimensions)
+    ws.column_dimensions.update(template_ws.column_dimensions)
+    ws.sheet_format = copy(template_ws.sheet_format)
+    ws.sheet_properties = copy(template_ws.sheet_properties)
+    ws.merged_cells = copy(template_ws.merged_cells)
+    ws.page_margins = copy(template_ws.page_margins)
+    ws.page_setup = copy(template_ws.page_setup)
+    ws.print_options = copy(template_ws.print_options)
+    return ws
+
+
+def _fill_template_page_points(ws, results: list, max_value, start_row: int) -> list[int]:
+    """Режим «points»: D — макс. балл на каждой строке ученика, E — доля от max_value в процентах."""
+    # Ensure the template column header for max points is present (your note: D7 is the column name).
+    ws["D7"].value = "Макс"
+    mv = _to_number(max_value)
+    # Max is shown "under D7" on every student row; rows past the class are cleared by the caller.
+    if max_value not in (None, ""):
+        mv_cell = int(mv) if mv.is_integer() else mv
+        for r in range(start_row, start_row + len(results)):
+            ws.cell(row=r, column=_COL["D"]).value = mv_cell
+    percents = [(_to_number(res) / mv * 100.0) if mv > 0 else 0.0 for res in results]
+    for r, percent in enumerate(percents, start_row):
+        ws.cell(row=r, column=_COL["E"]).value = round(percent, 2)
+    return [_percent_level(percent) for percent in percents]
+
+
+def _fill_template_page_percent(ws, results: list, max_value, start_row: int) -> list[int]:
+    """Режим «percent»: результат уже в процентах 0–100, колонка D пустая."""
+    _clear_rows(ws, start_row, start_row + len(results) - 1, ["D"])
+    percents = [_to_number(res) for res in results]
+    for r, percent in enumerate(percents, start_row):
+        ws.cell(row=r, column=_COL["E"]).value = round(percent, 2)
+    return [_percent_level(percent) for percent in percents]
+
+
+def _fill_template_page_grade(ws, results: list, max_value, start_row: int) -> list[int]:
+    """Режим «grade»: уровень берётся прямо из оценки 2–5, процент не имеет смысла (D и E пустые)."""
+    _clear_rows(ws, start_row, start_row + len(results) - 1, ["D", "E"])
+    return [_GRADE_LEVEL.get(int(_to_number(res)), _LEVEL_NONE) for res in results]
+
+
+def _fill_template_page_unknown(ws, results: list, max_value, start_row: int) -> list[int]:
+    """Неизвестный режим: как раньше — D пустая, каждый результат считается как 0%."""
+    _clear_rows(ws, start_row, start_row + len(results) - 1, ["D"])
+    for r in range(start_row, start_row + len(results)):
+        ws.cell(row=r, column=_COL["E"]).value = 0.0
+    return [_percent_level(0.0)] * len(results)
+
+
+_FILL_MODE_COLUMNS = {
+    "points": _fill_template_page_points,
+    "percent": _fill_template_page_percent,
+    "grade": _fill_template_page_grade,
+}
 
 
 def _fill_template_page(
@@ -115,107 +256,37 @@ def _fill_template_page(
     start_row = 8
     max_row = 39  # template is built for up to ~32 students; keep same cleanup window as example
 
-    # Ensure the template column header for max points is present (your note: D7 is the column name).
-    if mode == "points":
-        ws["D7"].value = "Макс"
+    # Mode-specific columns (D, E) and levels are filled column-wise before the shared per-row writes.
+    fill_mode_columns = _FILL_MODE_COLUMNS.get(mode, _fill_template_page_unknown)
+    n_rows = max(0, min(len(fio_list), max_row - start_row + 1))
+    results = [result_list[i] if i < len(result_list) else "" for i in range(n_rows)]
+    levels = fill_mode_columns(ws, results, max_value, start_row)
+    level_counts = [levels.count(level) for level in range(len(_LEVEL_FLAGS))]
 
     # Fill rows
-    count_5 = count_4 = count_3 = count_2 = 0
-    # If you want max shown "under D7" regardless of row, prefill D8:D39 with the same max.
-    if mode == "points" and max_value not in (None, ""):
-        mv = _to_number(max_value)
-        mv = int(mv) if mv.is_integer() else mv
-        for r in range(start_row, max_row + 1):
-            ws[f"D{r}"].value = mv
-
-    for i, fio in enumerate(fio_list):
+    for i in range(n_rows):
         r = start_row + i
-        if r > max_row:
-            break
-        ws[f"B{r}"].value = fio
-
-        res = result_list[i] if i < len(result_list) else ""
-        ws[f"C{r}"].value = res
-
-        # D - max points already prefilled for points mode; clear for non-points.
-        if mode != "points":
-            ws[f"D{r}"].value = None
-
-        # Compute percent and grade flags similar to example template logic
-        percent = 0.0
-        if mode == "percent":
-            percent = _to_number(res)
-        elif mode == "points":
-            rv = _to_number(res)
-            mv = _to_number(max_value)
-            percent = (rv / mv * 100.0) if mv > 0 else 0.0
-        elif mode == "grade":
-            g = int(_to_number(res))
-            # For grade mode, place flags directly (percent is not meaningful)
-            ws[f"E{r}"].value = None
-            ws[f"F{r}"].value = 1 if g == 5 else 0
-            ws[f"G{r}"].value = 1 if g == 4 else 0
-            ws[f"H{r}"].value = 1 if g == 3 else 0
-            ws[f"I{r}"].value = 1 if g == 2 else 0
-            if g == 5:
-                count_5 += 1
-                ws[f"L{r}"].value = fio
-                ws[f"M{r}"].value = ""
-                ws[f"N{r}"].value = ""
-            elif g in (3, 4):
-                if g == 4:
-                    count_4 += 1
-                else:
-                    count_3 += 1
-                ws[f"L{r}"].value = ""
-                ws[f"M{r}"].value = fio
-                ws[f"N{r}"].value = ""
-            elif g == 2:
-                count_2 += 1
-                ws[f"L{r}"].value = ""
-                ws[f"M{r}"].value = ""
-                ws[f"N{r}"].value = fio
-            else:
-                ws[f"L{r}"].value = ""
-                ws[f"M{r}"].value = ""
-                ws[f"N{r}"].value = ""
-            continue
-
-        ws[f"E{r}"].value = round(percent, 2)
-        is5 = percent >= 85
-        is4 = 65 <= percent < 85
-        is3 = 40 <= percent < 65
-        is2 = percent < 40
-
-        ws[f"F{r}"].value = 1 if is5 else 0
-        ws[f"G{r}"].value = 1 if is4 else 0
-        ws[f"H{r}"].value = 1 if is3 else 0
-        ws[f"I{r}"].value = 1 if is2 else 0
-
-        if is5:
-            count_5 += 1
-            ws[f"L{r}"].value = fio
-            ws[f"M{r}"].value = ""
-            ws[f"N{r}"].value = ""
-        elif is4 or is3:
-            if is4:
-                count_4 += 1
-            else:
-                count_3 += 1
-            ws[f"L{r}"].value = ""
-            ws[f"M{r}"].value = fio
-            ws[f"N{r}"].value = ""
-        else:
-            count_2 += 1
-            ws[f"L{r}"].value = ""
-            ws[f"M{r}"].value = ""
-            ws[f"N{r}"].value = fio
+        fio = fio_list[i]
+        ws.cell(row=r, column=_COL["B"]).value = fio
+        ws.cell(row=r, column=_COL["C"]).value = results[i]
+
+        level = levels[i]
+        for c, flag in zip(_FLAG_COLS, _LEVEL_FLAGS[level]):
+            ws.cell(row=r, column=c).value = flag
+        names = ["", "", ""]
+        name_slot = _LEVEL_NAME_SLOT[level]
+        if name_slot is not None:
+            names[name_slot] = fio
+        for c, name in zip(_NAME_COLS, names):
+            ws.cell(row=r, column=c).value = name
 
     # Clear remaining rows in template range
     last_filled = min(max_row, start_row + len(fio_list) - 1)
     if last_filled < max_row:
         _clear_rows(ws, last_filled + 1, max_row, ["B", "C", "D", "E", "F", "G", "H", "I", "L", "M", "N"])
 
+    count_5, count_4, count_3, count_2 = level_counts[:_LEVEL_NONE]
+
     # Summary cells (following example positions)
     ws["F41"].value = count_5
     ws["G42"].value = count_4
@@ -260,19 +331,15 @@ def _fill_grades_page(
     max_row = 39
 
     # Header
-    ws[f"A{header_row}"].value = "№"
-    ws[f"B{header_row}"].value = "ФИО"
-    ws[f"C{header_row}"].value = "Оценка"
-    ws[f"D{header_row}"].value = "%"
+    ws.cell(row=header_row, column=_COL["A"]).value = "№"
+    ws.cell(row=header_row, column=_COL["B"]).value = "ФИО"
+    ws.cell(row=header_row, column=_COL["C"]).value = "Оценка"
+    ws.cell(row=header_row, column=_COL["D"]).value = "%"
     # Per user: E and F must be empty. Put labels back to J7/K7.
-    ws[f"E{header_row}"].value = None
-    ws[f"F{header_row}"].value = None
-    ws[f"J{header_row}"].value = "кач-ва"
-    ws[f"K{header_row}"].value = "успев"
-
-    # Remove/clear everything from L onwards (and keep G-I empty too)
-    for col in ["G", "H", "I", "L", "M", "N"]:
-        ws[f"{col}{header_row}"].value = None
+    ws.cell(row=header_row, column=_COL["E"]).value = None
+    ws.cell(row=header_row, column=_COL["F"]).value = None
+    ws.cell(row=header_row, column=_COL["J"]).value = "кач-ва"
+    ws.cell(row=header_row, column=_COL["K"]).value = "успев"
 
     count_5 = count_4 = count_3 = count_2 = 0
     qual_flags = []
@@ -296,27 +363,25 @@ def _fill_grades_page(
         elif g_num == 2:
             count_2 += 1
 
-        ws[f"A{r}"].value = num
-        ws[f"B{r}"].value = fio
-        ws[f"C{r}"].value = g_num if g_num else g
-        ws[f"D{r}"].value = _to_number(p) if str(p).strip() != "" else p
+        ws.cell(row=r, column=_COL["A"]).value = num
+        ws.cell(row=r, column=_COL["B"]).value = fio
+        ws.cell(row=r, column=_COL["C"]).value = g_num if g_num else g
+        ws.cell(row=r, column=_COL["D"]).value = _to_number(p) if str(p).strip() != "" else p
         # E and F must be empty (no per-student flags)
-        ws[f"E{r}"].value = None
-        ws[f"F{r}"].value = None
+        ws.cell(row=r, column=_COL["E"]).value = None
+        ws.cell(row=r, column=_COL["F"]).value = None
 
         qual = 1 if g_num in (4, 5) else 0
         succ = 1 if g_num in (3, 4, 5) else 0
         qual_flags.append(qual)
         succ_flags.append(succ)
 
-        # Clear everything from L onwards ("Высокий" etc), and keep G-I empty.
-        for col in ["G", "H", "I", "L", "M", "N"]:
-            ws[f"{col}{r}"].value = None
-
     # Clear remaining rows
     last_filled = min(max_row, start_row + len(fio_list) - 1)
     if last_filled < max_row:
-        _clear_rows(ws, last_filled + 1, max_row, ["A", "B", "C", "D", "E", "F", "G", "H", "I", "L", "M", "N"])
+        _clear_rows(ws, last_filled + 1, max_row, ["A", "B", "C", "D", "E", "F"])
+    # Keep G-I empty and clear everything from L onwards ("Высокий" etc) on the header and all table rows.
+    _clear_rows(ws, header_row, max_row, ["G", "H", "I", "L", "M", "N"])
 
     # Keep summary cells consistent with template example
     ws["F41"].value = count_5
@@ -330,11 +395,6 @@ def _fill_grades_page(
     ws["J8"].value = round(quality, 2)
     ws["K8"].value = round(success_rate, 2)
 
-    # Also wipe any leftover "table tail" beyond N for the used range (best-effort).
-    for r in range(header_row, max_row + 1):
-        for col in ["L", "M", "N"]:
-            ws[f"{col}{r}"].value = None
-
 
 def build_report(
     template_path: Path,
@@ -385,9 +445,7 @@ def build_report(
         template_ws = wb.worksheets[0]
 
     def mk_sheet(name: str):
-        ws = wb.copy_worksheet(template_ws)
-        ws.title = name[:31]
-        return ws
+        return _new_page(wb, template_ws, name)
 
     # Sort by student number to keep stable ordering
     students_sorted = sorted(students, key=lambda s: int(s.get("num") or 0))
@@ -396,12 +454,17 @@ def build_report(
     # Decide which pages exist (based on JSON fields / section points)
     # "Формативная оценка" in the table is the numeric value in the 3rd column (we store it as `average`).
     # Max is always 10 (per user).
-    has_formative = any((s.get("average") not in (None, "", "0", 0)) for s in students_sorted)
-    has_grades = any((s.get("grade") not in (None, "", "0", 0)) for s in students_sorted)
-
+    # One pass over students: page flags, parsed section points and the СОр 1–3 / СОч columns.
+    has_formative = has_grades = False
     sec_present: set[int] = set()
+    sec_vals: dict[int, list] = {sec: [] for sec in (0, 1, 2, 3)}
     for s in students_sorted:
-        sec_present |= set(_points_by_section(s.get("points") or {}, quarter_num).keys())
+        has_formative = has_formative or s.get("average") not in _EMPTY_MARKS
+        has_grades = has_grades or s.get("grade") not in _EMPTY_MARKS
+        sec_map = _points_by_section(s.get("points") or {}, quarter_num)
+        sec_present |= sec_map.keys()
+        for sec, vals in sec_vals.items():
+            vals.append(sec_map.get(sec, ""))
 
     has_quarter_header = bool(ctx.get("has_quarter_grade_header"))
 
@@ -425,10 +488,6 @@ def build_report(
         if sec not in sec_present:
             continue
         ws = mk_sheet(f"СОр {sec}")
-        vals = []
-        for s in students_sorted:
-            pts = _points_by_section(s.get("points") or {}, quarter_num)
-            vals.append(pts.get(sec, ""))
         _fill_template_page(
             ws,
             organization_name=org_name,
@@ -436,17 +495,13 @@ def build_report(
             teacher_fio=teacher_fio,
             page_title=f"СОр {sec}",
             fio_list=fio_list,
-            result_list=vals,
+            result_list=sec_vals[sec],
             max_value=max_points.get(sec),
             mode="points",
         )
 
     if has_quarter_header and 0 in sec_present:
         ws = mk_sheet("СОч")
-        vals = []
-        for s in students_sorted:
-            pts = _points_by_section(s.get("points") or {}, quarter_num)
-            vals.append(pts.get(0, ""))
         _fill_template_page(
             ws,
             organization_name=org_name,
@@ -454,7 +509,7 @@ def build_report(
             teacher_fio=teacher_fio,
             page_title="СОч",
             fio_list=fio_list,
-            result_list=vals,
+            result_list=sec_vals[0],
             max_value=max_points.get(0),
             mode="points",
         )
@@ -1,32 +1,125 @@
 """Сборка Word-отчёта по готовому Excel: шаблон .docx, таблицы анализа, уровни, цели."""
 import argparse
+import io
 import json
+import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
 from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
 from docx import Document
+from docx.oxml import OxmlElement
 from docx.shared import Pt
+from docx.table import Table
+from docx.text.run import Run
+
+logger = logging.getLogger(__name__)
+
+_KAZAKH_LANGS = frozenset({"kk", "kaz", "kazakh"})
+
+_FONT_NAME = "Times New Roman"
+_FONT_SIZE = Pt(12)
+
+_FILENAME_BAD_CHARS_RE = re.compile(r"[<>:\"/\\\\|?*]+")
+# Имя файла «5В Математика» / «5 «В» Математика»: класс, литера, предмет
+_CLASS_SUBJECT_STEM_RE = re.compile(r"^\s*(\d+)\s*[«\"]?\s*([A-Za-zА-ЯЁӘҒҚҢӨҰҮҺ])\s*[»\"]?\s+(.+?)\s*$")
+# Заголовки «СОР 1»/«БЖБ 1» (с пробелом и без)
+_SOR_KIND_RE = re.compile(r"(?:сор|бжб)\s*([123])")
+_SOR_KIND_NOSPACE_RE = re.compile(r"(?:сор|бжб)(\d)")
+# Лист СОР/СОЧ: «сор» или «соч» в любом регистре
+_SOR_SOCH_SHEET_RE = re.compile(r"со[рч]", re.IGNORECASE)
+# Шаблонные строки: период и предмет (RU/KK)
+_PERIOD_RU_RE = re.compile(r"_+\s*(четверть|полугодие)", re.IGNORECASE)
+_PERIOD_KZ_RE = re.compile(r"(мәліметтер\s*)_+", re.IGNORECASE)
+_QUARTER_KZ_RE = re.compile(r"_+\s*(тоқсан)", re.IGNORECASE)
+_SUBJECT_KZ_RE = re.compile(r"_+\s*(пәнінен)", re.IGNORECASE)
+_SUBJECT_KZ_ALT_RE = re.compile(r"(пәні\s*)_+", re.IGNORECASE)
+_SUBJECT_RU_WORD_RE = re.compile(r"предмет", re.IGNORECASE)
+_SUBJECT_RU_RE = re.compile(r"((?:по\s+)?предмету\s*)_+", re.IGNORECASE)
+_SUBJECT_RU_ALT_RE = re.compile(r"((?:по\s+)?предмет\s*)_+", re.IGNORECASE)
+# Заголовки таблицы целей (RU/KK): «достигнутые цели» / «қол жеткізілген мақсаттар»
+# и «цели, вызвавшие затруднения» / «қиындық тудырған мақсаттар»
+_GOAL_ACHIEVED_RE = re.compile(r"достигнут|қол жеткіз|жеткізілген|цель|мақсат")
+_GOAL_DIFFICULTIES_RE = re.compile(r"затруднен|вызвавш|қиындық|тудырған")
+
+# Поля шаблона вида «Ключ: _»: ключ (до двоеточия, в нижнем регистре) -> (подпись, поле).
+# Подпись None — строка целиком заменяется значением поля.
+_TEMPLATE_FIELDS_RU = {
+    "класс": ("Класс:", "class"),
+    "педагог": ("Педагог:", "teacher"),
+    "цель": (None, "goal"),
+}
+_TEMPLATE_FIELDS_KZ = {
+    "сынып": ("Сынып:", "class"),
+    "педагог": ("Педагог:", "teacher"),
+    "мұғалім": ("Мұғалім:", "teacher"),
+    "мақсат": (None, "goal"),
+}
+
+# Колонки сводной таблицы анализа: роль -> подстроки заголовка (RU/KK)
+_ANALYSIS_COLUMN_KEYWORDS = (
+    ("class", ("класс", "бжб")),  # Class or БЖБ
+    ("pisali", ("писали", "орындағаны")),  # Students count
+    ("max", ("макс",)),  # Max points
+    ("quality", ("кач", "сапа")),  # Quality %
+    ("success", ("успев", "үлгерім")),  # Success %
+    # Grade columns - by level names
+    ("high", ("высок", "жоғары", "5")),  # Высокий/Жоғары = only grade 5
+    ("mid", ("средн", "орта", "4")),  # Средний/Орта = grades 3+4
+    ("low", ("низк", "төмен", "2")),  # Низкий/Төмен = only grade 2
+)
+# Колонки таблицы уровней: подписи заголовка, уже нормализованные как в _fill_level_table
+# (нижний регистр, без пробелов); перебираются по порядку, первая найденная побеждает
+_LEVEL_TABLE_SOR1_KEYS = ("сор1", "бжб1")
+_LEVEL_TABLE_SOR2_KEYS = ("сор2", "бжб2")
+_LEVEL_TABLE_SOR3_KEYS = ("сор3", "бжб3")
+_LEVEL_TABLE_SOCH_KEYS = ("соч", "тжб")
+_LEVEL_TABLE_LEVEL_KEYS = ("уровень", "деңгей")
+# Уровень строки таблицы по первой колонке (RU/KK); порядок проверки: высокий, средний, низкий
+_LEVEL_MAP = (
+    ("высок", "high"),
+    ("жоғары", "high"),
+    ("средн", "mid"),
+    ("орта", "mid"),
+    ("низк", "low"),
+    ("төмен", "low"),
+)
+
+# Область листа Excel-отчёта, которую читает Word-отчёт: A1:N199
+_SHEET_MAX_ROW = 199
+_SHEET_MAX_COL = column_index_from_string("N")
+
+
+def _is_kazakh(lang: str) -> bool:
+    """True для казахского языка отчёта (kk/kaz/kazakh)."""
+    return lang.lower() in _KAZAKH_LANGS
 
 
 def _sanitize_filename(s: str) -> str:
     """Очищает строку для имени выходного .docx (недопустимые символы Windows)."""
     s = " ".join((s or "").split()).strip()
-    s = re.sub(r"[<>:\"/\\\\|?*]+", "_", s)
+    s = _FILENAME_BAD_CHARS_RE.sub("_", s)
     s = s.strip(" .")
     return s or "report"
 
 
+@lru_cache(maxsize=4096)
 def _normalize_text(s: str, replace_yo: bool = False, remove_spaces: bool = False) -> str:
     """Нормализует текст для сравнения: нижний регистр, опционально ё→е и сжатие пробелов."""
-    s = (s or "").lower().strip()
+    s = (s or "").lower()
     if replace_yo:
         s = s.replace("ё", "е")
+    # str.split() без аргументов режет по тем же пробельным символам, что и \s, и без regex
     if remove_spaces:
-        s = re.sub(r"\s+", "", s)
+        s = "".join(s.split())
     else:
-        s = re.sub(r"\s+", " ", s).strip()
+        s = " ".join(s.split())
     return s
 
 
@@ -38,39 +131,62 @@ def _read_text(path: Path) -> str | None:
         return None
 
 
+@lru_cache(maxsize=4)
+def _template_bytes(path: str, mtime_ns: int) -> bytes:
+    """Содержимое .docx-шаблона; кэш по пути и mtime, чтобы пакетная генерация не перечитывала файл."""
+    return Path(path).read_bytes()
+
+
+def _open_template(template_docx: Path) -> Document:
+    """Открывает новый Document из (закэшированных) байтов шаблона."""
+    data = _template_bytes(str(template_docx), template_docx.stat().st_mtime_ns)
+    return Document(io.BytesIO(data))
+
+
+def _read_context(path: Path) -> dict:
+    """Читает criteria_context.json; если файла нет или он не разбирается — пустой словарь."""
+    try:
+        if path.exists():
+            ctx = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(ctx, dict):
+                return ctx
+    except Exception:
+        pass
+    return {}
+
+
+@lru_cache(maxsize=4096)
 def _normalize_name(s: str) -> str:
     """Убирает «ёлочки» и лишние пробелы для сопоставления имён файлов."""
     s = (s or "").lower()
     s = s.replace("«", "").replace("»", "")
-    s = re.sub(r"\s+", " ", s).strip()
+    s = " ".join(s.split())
     return s
 
 
-def _resolve_xlsx(path: Path) -> Path:
-    """Если путь к xlsx не существует, ищет в той же папке файл с похожим нормализованным именем."""
+def _resolve_xlsx(path: Path) -> Path | None:
+    """Если путь к xlsx не существует, ищет в той же папке файл с похожим нормализованным именем.
+
+    Возвращает существующий файл или None, если ничего подходящего нет.
+    """
     if path.exists():
         return path
     parent = path.parent if path.parent else Path(".")
     if not parent.exists():
-        return path
+        return None
 
     want = _normalize_name(path.stem)
-    candidates = list(parent.glob("*.xlsx"))
-    if not candidates:
-        return path
-
-    # Exact normalized match first
-    for c in candidates:
-        if _normalize_name(c.stem) == want:
-            return c
-
-    # Containment fallback
-    for c in candidates:
+    # Один проход: точное совпадение нормализованного имени возвращаем сразу,
+    # первое совпадение по вхождению — только если точного нет.
+    contained = None
+    for c in parent.glob("*.xlsx"):
         cn = _normalize_name(c.stem)
-        if want and (want in cn or cn in want):
+        if cn == want:
             return c
+        if contained is None and want and (want in cn or cn in want):
+            contained = c
 
-    return path
+    return contained
 
 
 def _iter_paragraphs(doc: Document):
@@ -84,69 +200,74 @@ def _iter_paragraphs(doc: Document):
                     yield p
 
 
-def _replace_in_doc(doc: Document, mapping: dict[str, str]) -> int:
-    """Подставляет плейсхолдеры {{KEY}}, <<KEY>>, [KEY], {KEY} в абзацах и ячейках (best-effort)."""
+@lru_cache(maxsize=16)
+def _placeholder_re(keys: frozenset[str]) -> re.Pattern:
+    """Одно регулярное выражение на все формы плейсхолдеров {{KEY}}, <<KEY>>, [KEY], {KEY}."""
+    alt = "|".join(map(re.escape, sorted(keys, key=len, reverse=True)))
+    return re.compile(rf"\{{\{{({alt})\}}\}}|<<({alt})>>|\[({alt})\]|\{{({alt})\}}")
+
+
+def _replace_in_doc(doc: Document, mapping: dict[str, str], paragraphs: list | None = None) -> int:
+    """Подставляет плейсхолдеры {{KEY}}, <<KEY>>, [KEY], {KEY} в абзацах и ячейках (best-effort).
+
+    paragraphs — уже собранный список абзацев документа (иначе обходится заново).
+    """
+    if not mapping:
+        return 0
+    # Быстрая проверка одним XPath по всем <w:t> тела документа: текст любого абзаца — подстрока
+    # этой склейки, так что если ни одного ключа в ней нет, плейсхолдеров нет и обходить абзацы незачем.
+    body_text = "".join(doc.element.body.xpath(".//w:t/text()"))
+    if not any(k in body_text for k in mapping):
+        return 0
     replaced = 0
-    patterns = []
-    for k, v in mapping.items():
-        patterns.append((f"{{{{{k}}}}}", v))
-        patterns.append((f"<<{k}>>", v))
-        patterns.append((f"[{k}]", v))
-        patterns.append((f"{{{k}}}", v))
-
-    for p in _iter_paragraphs(doc):
+    pattern = _placeholder_re(frozenset(mapping))
+
+    def sub(m: re.Match) -> str:
+        return mapping[m.group(m.lastindex)]
+
+    for p in paragraphs if paragraphs is not None else _iter_paragraphs(doc):
         txt = p.text
-        new_txt = txt
-        for pat, val in patterns:
-            if pat in new_txt:
-                new_txt = new_txt.replace(pat, val)
-        if new_txt != txt:
+        # Все формы плейсхолдеров начинаются с "{", "<" или "[" — остальные абзацы пропускаем
+        if "{" not in txt and "<" not in txt and "[" not in txt:
+            continue
+        new_txt, n = pattern.subn(sub, txt)
+        if n and new_txt != txt:
             # Replace whole paragraph text (simple and reliable)
-            for r in p.runs:
-                r.text = ""
-            run = p.add_run(new_txt)
-            _apply_font(run)
+            _set_paragraph_text(p, new_txt)
             replaced += 1
     return replaced
 
 
 def _fill_goals_table(doc: Document, goals_data: dict) -> bool:
     """Находит таблицу «цели» (RU/KK по заголовкам) и заполняет строки СОР1–3 и СОЧ полями achieved/difficulties."""
-    # Keywords for Russian and Kazakh
-    # Russian: достигнутые цели, цели вызвавшие затруднения
-    # Kazakh: қол жеткізілген мақсаттар, қиындық тудырған мақсаттар
-    achieved_keywords = ["достигнут", "достигнутые", "қол жеткіз", "жеткізілген"]
-    difficulties_keywords = ["затруднен", "затруднения", "вызвавш", "қиындық", "тудырған"]
-    goal_keywords = ["цель", "мақсат"]
-    
+    # doc.tables, tbl.rows[i] и row.cells при каждом обращении заново обходят XML — берём их один раз
+    tables = doc.tables
     # Check if we have at least one table
-    if not doc.tables or len(doc.tables) == 0:
+    if not tables:
         return False
     
     # Try to find goals table - check first table first, then others
-    for tbl_idx, tbl in enumerate(doc.tables):
+    for tbl_idx, tbl in enumerate(tables):
+        tbl_rows = list(tbl.rows)
+        n_rows = len(tbl_rows)
         # Check if table has enough rows (need at least 11 rows: 0-10)
-        if len(tbl.rows) < 11:
+        if n_rows < 11:
             continue
         
         # Check multiple possible header rows (6, 5, 4) as structure may vary
         for header_row_idx in [6, 5, 4]:
-            if header_row_idx >= len(tbl.rows):
+            if header_row_idx >= n_rows:
                 continue
                 
-            header_row = tbl.rows[header_row_idx]
-            if len(header_row.cells) < 2:
+            header_cells = tbl_rows[header_row_idx].cells
+            if len(header_cells) < 2:
                 continue
             
-            header_text = [_normalize_text(c.text) for c in header_row.cells]
+            header_text = [_normalize_text(c.text) for c in header_cells]
             header_join = " ".join(header_text)
             
             # Look for goals table headers - Russian or Kazakh
-            has_achieved = any(keyword in header_join for keyword in achieved_keywords)
-            has_difficulties = any(keyword in header_join for keyword in difficulties_keywords)
-            has_goal = any(keyword in header_join for keyword in goal_keywords)
-            
-            if not ((has_achieved or has_goal) and has_difficulties):
+            if not (_GOAL_ACHIEVED_RE.search(header_join) and _GOAL_DIFFICULTIES_RE.search(header_join)):
                 continue
             
             # Find column indices
@@ -154,13 +275,11 @@ def _fill_goals_table(doc: Document, goals_data: dict) -> bool:
             col_difficulties = None
             
             for i, h in enumerate(header_text):
-                # Achieved column - has achieved keywords but not difficulties keywords
-                if any(keyword in h for keyword in achieved_keywords + goal_keywords):
-                    if not any(dk in h for dk in difficulties_keywords):
-                        col_achieved = i
-                # Difficulties column
-                if any(keyword in h for keyword in difficulties_keywords):
+                # Difficulties column; otherwise achieved column (achieved/goal keywords)
+                if _GOAL_DIFFICULTIES_RE.search(h):
                     col_difficulties = i
+                elif _GOAL_ACHIEVED_RE.search(h):
+                    col_achieved = i
             
             if col_achieved is None or col_difficulties is None:
                 continue
@@ -175,13 +294,13 @@ def _fill_goals_table(doc: Document, goals_data: dict) -> bool:
             
             filled_any = False
             for row_idx, goal_key in row_mapping:
-                if row_idx >= len(tbl.rows):
+                if row_idx >= n_rows:
                     continue
                 
                 if goal_key not in goals_data:
                     continue
                 
-                cells = tbl.rows[row_idx].cells
+                cells = tbl_rows[row_idx].cells
                 if len(cells) <= max(col_achieved, col_difficulties):
                     continue
                 
@@ -207,96 +326,17 @@ def _fill_goals_table(doc: Document, goals_data: dict) -> bool:
     return False
 
 
-def _fill_goals_table_legacy(doc: Document, goals_data: dict) -> bool:
-    """Устаревший вариант: первая таблица, фиксированная строка заголовка (индекс 6)."""
-    # Check if we have at least one table
-    if not doc.tables or len(doc.tables) == 0:
-        return False
-    
-    # Use first table (index 0)
-    tbl = doc.tables[0]
-    
-    # Check if table has enough rows (need at least 11 rows: 0-10)
-    if len(tbl.rows) < 11:
-        return False
-    
-    # Check row 7 (index 6) for headers
-    header_row = tbl.rows[6]
-    if len(header_row.cells) < 2:
-        return False
-    
-    header_text = [_normalize_text(c.text) for c in header_row.cells]
-    header_join = " ".join(header_text)
-    
-    # Look for goals table headers
-    has_achieved = any(keyword in header_join for keyword in ["достигнут", "достигнутые", "цель"])
-    has_difficulties = any(keyword in header_join for keyword in ["затруднен", "затруднения", "вызвавш"])
-    
-    if not (has_achieved and has_difficulties):
-        return False
-    
-    # Find column indices
-    col_achieved = None
-    col_difficulties = None
-    
-    for i, h in enumerate(header_text):
-        if any(keyword in h for keyword in ["достигнут", "достигнутые", "цель"]) and "затруднен" not in h:
-            col_achieved = i
-        if any(keyword in h for keyword in ["затруднен", "затруднения", "вызвавш"]):
-            col_difficulties = i
-    
-    if col_achieved is None or col_difficulties is None:
-        return False
-    
-    # Fill rows 8-11 (indices 7-10) with СОР1, СОР2, СОР3, СОЧ
-    row_mapping = [
-        (7, "sor1"),   # Row 8 -> СОР1
-        (8, "sor2"),   # Row 9 -> СОР2
-        (9, "sor3"),   # Row 10 -> СОР3
-        (10, "soch"),  # Row 11 -> СОЧ
-    ]
-    
-    filled_any = False
-    for row_idx, goal_key in row_mapping:
-        if row_idx >= len(tbl.rows):
-            continue
-        
-        if goal_key not in goals_data:
-            continue
-        
-        cells = tbl.rows[row_idx].cells
-        if len(cells) <= max(col_achieved, col_difficulties):
-            continue
-        
-        goal = goals_data[goal_key]
-        
-        # Fill achieved goals column
-        if col_achieved < len(cells):
-            text = goal.get("achieved", "")
-            if text:
-                _set_cell_text(cells[col_achieved], text)
-        
-        # Fill difficulties column
-        if col_difficulties < len(cells):
-            text = goal.get("difficulties", "")
-            if text:
-                _set_cell_text(cells[col_difficulties], text)
-        
-        filled_any = True
-    
-    return filled_any
-
-
 def _fill_difficulties_table(doc: Document, goals_data: dict) -> bool:
     """Заполняет третью таблицу шаблона: перечень затруднений, причины, коррекция по колонкам СОР1–3 и СОЧ."""
+    tables = doc.tables
     # Check if we have at least 3 tables
-    if not doc.tables or len(doc.tables) < 3:
+    if len(tables) < 3:
         return False
     
-    # Use third table (index 2)
-    tbl = doc.tables[2]
+    # Use third table (index 2); cells of every row are materialized once
+    table_cells = [row.cells for row in tables[2].rows]
     
-    if len(tbl.rows) < 3:
+    if len(table_cells) < 3:
         return False
     
     # Find rows by text in column 2 (index 1)
@@ -309,8 +349,7 @@ def _fill_difficulties_table(doc: Document, goals_data: dict) -> bool:
     row_reasons = None
     row_correction = None
     
-    for r in range(len(tbl.rows)):
-        cells = tbl.rows[r].cells
+    for r, cells in enumerate(table_cells):
         if len(cells) < 2:
             continue
         
@@ -333,7 +372,10 @@ def _fill_difficulties_table(doc: Document, goals_data: dict) -> bool:
             row_correction = r
     
     # Логирование для отладки
-    print(f"[DEBUG] Table 3 row mapping: difficulties={row_difficulties}, reasons={row_reasons}, correction={row_correction}")
+    logger.debug(
+        "Table 3 row mapping: difficulties=%s, reasons=%s, correction=%s",
+        row_difficulties, row_reasons, row_correction,
+    )
     
     if not any([row_difficulties, row_reasons, row_correction]):
         return False
@@ -350,34 +392,34 @@ def _fill_difficulties_table(doc: Document, goals_data: dict) -> bool:
     
     # Fill difficulties row (Перечень затруднений)
     if row_difficulties is not None:
-        cells = tbl.rows[row_difficulties].cells
+        cells = table_cells[row_difficulties]
         for goal_key, col_idx in col_mapping.items():
             if goal_key in goals_data and col_idx < len(cells):
                 text = goals_data[goal_key].get("difficulties_list", "")
                 if text:
-                    print(f"[DEBUG] Writing difficulties_list to row={row_difficulties}, col={col_idx} ({goal_key}): {text[:50]}...")
+                    logger.debug("Writing difficulties_list to row=%s, col=%s (%s): %.50s...", row_difficulties, col_idx, goal_key, text)
                     _set_cell_text(cells[col_idx], text)
                     filled_any = True
     
     # Fill reasons row (Причины затруднений)
     if row_reasons is not None:
-        cells = tbl.rows[row_reasons].cells
+        cells = table_cells[row_reasons]
         for goal_key, col_idx in col_mapping.items():
             if goal_key in goals_data and col_idx < len(cells):
                 text = goals_data[goal_key].get("reasons", "")
                 if text:
-                    print(f"[DEBUG] Writing reasons to row={row_reasons}, col={col_idx} ({goal_key}): {text[:50]}...")
+                    logger.debug("Writing reasons to row=%s, col=%s (%s): %.50s...", row_reasons, col_idx, goal_key, text)
                     _set_cell_text(cells[col_idx], text)
                     filled_any = True
     
     # Fill correction row (Коррекционная работа)
     if row_correction is not None:
-        cells = tbl.rows[row_correction].cells
+        cells = table_cells[row_correction]
         for goal_key, col_idx in col_mapping.items():
             if goal_key in goals_data and col_idx < len(cells):
                 text = goals_data[goal_key].get("correction", "")
                 if text:
-                    print(f"[DEBUG] Writing correction to row={row_correction}, col={col_idx} ({goal_key}): {text[:50]}...")
+                    logger.debug("Writing correction to row=%s, col=%s (%s): %.50s...", row_correction, col_idx, goal_key, text)
                     _set_cell_text(cells[col_idx], text)
                     filled_any = True
     
@@ -387,32 +429,82 @@ def _fill_difficulties_table(doc: Document, goals_data: dict) -> bool:
 def _apply_font(run) -> None:
     """Задаёт вставляемому тексту шрифт Times New Roman 12 pt."""
     # Enforce Times New Roman 12 for inserted text.
-    run.font.name = "Times New Roman"
-    run.font.size = Pt(12)
+    run.font.name = _FONT_NAME
+    run.font.size = _FONT_SIZE
+
+
+@lru_cache(maxsize=1)
+def _font_rpr():
+    """Эталонный <w:rPr> со шрифтом _apply_font; копируется в каждый вставляемый прогон."""
+    run = Run(OxmlElement("w:r"), None)
+    _apply_font(run)
+    return run._r.rPr
+
+
+def _new_font_run(p_el):
+    """Удаляет прогоны абзаца <w:p> и добавляет один пустой прогон с эталонным шрифтом."""
+    # Работаем прямо с XML абзаца: старые прогоны удаляем, новый собираем из копии эталонного
+    # <w:rPr> — без обёрток Run/Font на каждую запись (XML тот же, что у add_run + _apply_font).
+    for r in p_el.r_lst:
+        p_el.remove(r)
+    r = p_el.add_r()
+    r.append(deepcopy(_font_rpr()))
+    return r
+
+
+def _set_p_element_lines(p_el, lines: list[str]) -> None:
+    """Пишет строки одним прогоном: <w:t> на строку, между строками <w:br/>.
+
+    Тот же XML, что даёт CT_R.text для строк, склеенных переводом строки, но без посимвольного
+    обхода текста; сами строки не должны содержать табуляций и переводов строки.
+    """
+    r = _new_font_run(p_el)
+    for i, line in enumerate(lines):
+        if i:
+            r.add_br()
+        if line:
+            r.add_t(line)
+
+
+def _set_p_element_text(p_el, text: str) -> None:
+    """То же, что _set_paragraph_text, но для голого элемента <w:p>."""
+    if "\t" in text or "\r" in text:
+        _new_font_run(p_el).text = text
+        return
+    _set_p_element_lines(p_el, text.split("\n"))
 
 
 def _set_paragraph_text(p, text: str) -> None:
     """Полностью заменяет текст абзаца одним прогоном с нужным шрифтом."""
-    for r in p.runs:
-        r.text = ""
-    run = p.add_run(text)
-    _apply_font(run)
+    _set_p_element_text(p._p, text)
 
 
 def _set_cell_text(cell, text: str) -> None:
     """Заменяет текст в первом абзаце ячейки таблицы, не ломая объект ячейки."""
-    if not cell.paragraphs:
+    paragraphs = cell.paragraphs
+    if not paragraphs:
         cell.text = str(text)
         # Best-effort apply font to the generated run(s)
         for p in cell.paragraphs:
             for r in p.runs:
                 _apply_font(r)
         return
-    p = cell.paragraphs[0]
-    for r in p.runs:
-        r.text = ""
-    run = p.add_run(str(text))
-    _apply_font(run)
+    _set_paragraph_text(paragraphs[0], str(text))
+
+
+def _set_cell_lines(cell, lines: list[str]) -> None:
+    """Заменяет текст ячейки строками через разрыв строки (как _set_cell_text по склеенным строкам)."""
+    paragraphs = cell.paragraphs
+    if not paragraphs or any("\t" in s or "\r" in s or "\n" in s for s in lines):
+        _set_cell_text(cell, "\n".join(lines))
+        return
+    _set_p_element_lines(paragraphs[0]._p, lines)
+
+
+def _set_row_text(cells, values) -> None:
+    """Записывает значения подряд в ячейки строки таблицы (str() для каждого значения)."""
+    for cell, value in zip(cells, values):
+        _set_cell_text(cell, str(value))
 
 
 def _extract_subject_from_filename(report_xlsx: Path, class_text: str) -> str:
@@ -420,10 +512,7 @@ def _extract_subject_from_filename(report_xlsx: Path, class_text: str) -> str:
     stem = report_xlsx.stem
     # 1) Strong regex: strip "<num><letter>" (with/without « ») from the beginning.
     #    Works for both "5В Математика" and "5 «В» Математика".
-    m = re.match(
-        r"^\s*(\d+)\s*[«\"]?\s*([A-Za-zА-ЯЁӘҒҚҢӨҰҮҺ])\s*[»\"]?\s+(.+?)\s*$",
-        stem,
-    )
+    m = _CLASS_SUBJECT_STEM_RE.match(stem)
     if m:
         subj = m.group(3).strip()
         return subj or stem
@@ -441,50 +530,68 @@ def _extract_subject_from_filename(report_xlsx: Path, class_text: str) -> str:
     return stem
 
 
+@lru_cache(maxsize=256)
+def _classify_sheet(name: str) -> str | None:
+    """Ключ sor1…sor3/soch по имени листа Excel (RU СОР/СОЧ, KK БЖБ/ТЖБ); иначе None."""
+    n = _normalize_text(name, replace_yo=True, remove_spaces=True)
+    # Kazakh: ТЖБ = СОЧ, БЖБ = СОР
+    if "соч" in n or "тжб" in n:
+        return "soch"
+    m = _SOR_KIND_NOSPACE_RE.search(n)
+    if m:
+        return f"sor{m.group(1)}"
+    return None
+
+
+# Подписи листов в строке цели, в порядке вывода
+_GOAL_SHEET_LABELS = {"sor1": "СОР 1", "sor2": "СОР 2", "sor3": "СОР 3", "soch": "СОЧ"}
+
+
 def _build_goal_from_sheets(sheetnames: list[str]) -> str:
     """Формирует строку цели («Анализ результатов СОР …») по списку имён листов Excel."""
-    present = []
-    # Normalize names used in our excel generator
-    for name in sheetnames:
-        n = name.lower()
-        if "сор 1" in n or "сор1" in n:
-            present.append("СОР 1")
-        elif "сор 2" in n or "сор2" in n:
-            present.append("СОР 2")
-        elif "сор 3" in n or "сор3" in n:
-            present.append("СОР 3")
-        elif "соч" in n:
-            present.append("СОЧ")
+    present = {_classify_sheet(name) for name in sheetnames}
     # Keep order
-    ordered = []
-    for x in ["СОР 1", "СОР 2", "СОР 3", "СОЧ"]:
-        if x in present:
-            ordered.append(x)
+    ordered = [label for kind, label in _GOAL_SHEET_LABELS.items() if kind in present]
     if not ordered:
-        ordered = ["СОР 1", "СОР 2", "СОР 3", "СОЧ"]
+        ordered = list(_GOAL_SHEET_LABELS.values())
     return "Цель: Анализ результатов " + ", ".join(ordered)
 
 
 def _is_sor_or_soch_sheet(name: str) -> bool:
     """True, если лист относится к СОР/СОЧ (не «Оценки» и не формативное оценивание)."""
-    n = (name or "").lower()
     # Only include SOR 1..3 and SOCH sheets; exclude "Оценки" and "Формативное..."
-    return ("сор" in n) or ("соч" in n)
-
-
-def _fill_template_lines(doc: Document, *, org: str, period: str | None, subject: str, class_text: str, teacher: str, goal: str, lang: str = "ru") -> int:
-    """Подставляет организацию, период, предмет, класс, педагога и цель по шаблонным строкам (RU/KK)."""
+    return _SOR_SOCH_SHEET_RE.search(name or "") is not None
+
+
+def _fill_template_lines(
+    doc: Document,
+    *,
+    org: str,
+    period: str | None,
+    subject: str,
+    class_text: str,
+    teacher: str,
+    goal: str,
+    is_kazakh: bool = False,
+    paragraphs: list | None = None,
+) -> int:
+    """Подставляет организацию, период, предмет, класс, педагога и цель по шаблонным строкам (RU/KK).
+
+    paragraphs — уже собранный список абзацев документа (иначе обходится заново).
+    """
     changed = 0
     org_replaced = False
     
     # Language-specific patterns
-    is_kazakh = lang.lower() in ("kk", "kaz", "kazakh")
+    template_fields = _TEMPLATE_FIELDS_KZ if is_kazakh else _TEMPLATE_FIELDS_RU
+    field_values = {"class": class_text, "teacher": teacher, "goal": goal}
     
-    for p in _iter_paragraphs(doc):
+    for p in paragraphs if paragraphs is not None else _iter_paragraphs(doc):
         t = p.text.strip()
-        tl = t.lower()
+        # Пустые абзацы-разделители отсекаем до lower() и прочих проверок
         if not t:
             continue
+        tl = t.lower()
 
         # 1) Organization name replacement
         # Russian: "наименование организации образования"
@@ -507,18 +614,19 @@ def _fill_template_lines(doc: Document, *, org: str, period: str | None, subject
         # 2) Period/quarter placeholder
         # Russian: "_ четверть" / "_ полугодие"
         # Kazakh: "мәліметтер _" or "_ тоқсан"
-        if period:
+        # Все шаблоны периода и предмета содержат "_": без него regex не запускаем.
+        if period and "_" in new_t:
             if is_kazakh:
                 # Kazakh pattern: "мәліметтер _" - replace underscore with period
-                if re.search(r"мәліметтер\s*_+", new_t, flags=re.IGNORECASE):
-                    new_t = re.sub(r"(мәліметтер\s*)_+", lambda m: m.group(1) + period, new_t, flags=re.IGNORECASE)
+                if _PERIOD_KZ_RE.search(new_t):
+                    new_t = _PERIOD_KZ_RE.sub(lambda m: m.group(1) + period, new_t)
                 # Also handle "_ тоқсан" (quarter in Kazakh)
-                if re.search(r"_+\s*тоқсан", new_t, flags=re.IGNORECASE):
-                    new_t = re.sub(r"_+\s*(тоқсан)", lambda m: period + " " + m.group(1), new_t, flags=re.IGNORECASE)
+                if _QUARTER_KZ_RE.search(new_t):
+                    new_t = _QUARTER_KZ_RE.sub(lambda m: period + " " + m.group(1), new_t)
             else:
                 # Russian pattern
-                if re.search(r"_+\s*(четверть|полугодие)", new_t, flags=re.IGNORECASE):
-                    new_t = re.sub(r"_+\s*(четверть|полугодие)", lambda m: period, new_t, flags=re.IGNORECASE)
+                if _PERIOD_RU_RE.search(new_t):
+                    new_t = _PERIOD_RU_RE.sub(lambda m: period, new_t)
 
         # 3) Subject placeholder
         # Russian: "по предмету _"
@@ -526,55 +634,28 @@ def _fill_template_lines(doc: Document, *, org: str, period: str | None, subject
         if subject and "_" in new_t:
             if is_kazakh:
                 # Kazakh: "_ пәнінен" -> "Математика пәнінен"
-                if re.search(r"_+\s*пәнінен", new_t, flags=re.IGNORECASE):
-                    new_t = re.sub(r"_+\s*(пәнінен)", lambda m: subject + " " + m.group(1), new_t, flags=re.IGNORECASE)
+                if _SUBJECT_KZ_RE.search(new_t):
+                    new_t = _SUBJECT_KZ_RE.sub(lambda m: subject + " " + m.group(1), new_t)
                 # Also handle "пәні _" pattern
-                elif re.search(r"пәні\s*_+", new_t, flags=re.IGNORECASE):
-                    new_t = re.sub(r"(пәні\s*)_+", lambda m: m.group(1) + subject, new_t, flags=re.IGNORECASE)
+                elif _SUBJECT_KZ_ALT_RE.search(new_t):
+                    new_t = _SUBJECT_KZ_ALT_RE.sub(lambda m: m.group(1) + subject, new_t)
             else:
                 # Russian pattern - use lambda to avoid regex escape issues
-                if re.search(r"предмет", new_t, flags=re.IGNORECASE):
-                    new_t2 = re.sub(
-                        r"((?:по\s+)?предмету\s*)_+",
-                        lambda m: m.group(1) + subject,
-                        new_t,
-                        flags=re.IGNORECASE,
-                        count=1,
-                    )
+                if _SUBJECT_RU_WORD_RE.search(new_t):
+                    new_t2 = _SUBJECT_RU_RE.sub(lambda m: m.group(1) + subject, new_t, count=1)
                     if new_t2 == new_t:
-                        new_t2 = re.sub(
-                            r"((?:по\s+)?предмет\s*)_+",
-                            lambda m: m.group(1) + subject,
-                            new_t,
-                            flags=re.IGNORECASE,
-                            count=1,
-                        )
+                        new_t2 = _SUBJECT_RU_ALT_RE.sub(lambda m: m.group(1) + subject, new_t, count=1)
                     new_t = new_t2
 
-        # 4) Class field
-        # Russian: "Класс: _"
-        # Kazakh: "Сынып: _"
-        if is_kazakh and tl.startswith("сынып:"):
-            new_t = f"Сынып: {class_text}"
-        elif not is_kazakh and tl.startswith("класс:"):
-            new_t = f"Класс: {class_text}"
-
-        # 5) Teacher field
-        # Russian: "Педагог: _"
-        # Kazakh: "Педагог: _" or "Мұғалім: _"
-        if is_kazakh and (tl.startswith("педагог:") or tl.startswith("мұғалім:")):
-            prefix = "Мұғалім:" if tl.startswith("мұғалім:") else "Педагог:"
-            new_t = f"{prefix} {teacher}"
-        elif not is_kazakh and tl.startswith("педагог:"):
-            new_t = f"Педагог: {teacher}"
-
-        # 6) Goal field
-        # Russian: "Цель: ..."
-        # Kazakh: "Мақсат: ..."
-        if is_kazakh and tl.startswith("мақсат:"):
-            new_t = goal
-        elif not is_kazakh and tl.startswith("цель:"):
-            new_t = goal
+        # 4-6) Class / teacher / goal fields: one lookup by the key before the colon
+        # Russian: "Класс: _", "Педагог: _", "Цель: ..."
+        # Kazakh: "Сынып: _", "Педагог: _" or "Мұғалім: _", "Мақсат: ..."
+        key, colon, _ = tl.partition(":")
+        field = template_fields.get(key) if colon else None
+        if field:
+            label, name = field
+            value = field_values[name]
+            new_t = f"{label} {value}" if label else value
 
         if new_t != t:
             _set_paragraph_text(p, new_t)
@@ -583,83 +664,87 @@ def _fill_template_lines(doc: Document, *, org: str, period: str | None, subject
     return changed
 
 
-def _fill_existing_analysis_table(doc: Document, blocks: list[dict], lang: str = "ru") -> bool:
-    """Заполняет готовую сводную таблицу анализа по блокам СОР1–3/СОЧ из Excel (RU/KK заголовки)."""
-    is_kazakh = lang.lower() in ("kk", "kaz", "kazakh")
-    
-    def norm(s: str) -> str:
-        s = (s or "").lower()
-        s = s.replace("ё", "е")
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
-
-    def norm_kind(s: str) -> str:
-        """Приводит заголовок вида «СОр 1»/«БЖБ 1»/«ТЖБ» к ключам sor1…sor3/soch."""
-        ns = _normalize_text(s, replace_yo=True)
-        # Russian: СОЧ, Kazakh: ТЖБ (Тоқсандық жиынтық бағалау)
-        if "соч" in ns or "тжб" in ns:
-            return "soch"
-        # Russian: СОР, Kazakh: БЖБ (Бөлім бойынша жиынтық бағалау)
-        m = re.search(r"(?:сор|бжб)\s*([123])", ns)
-        if m:
-            return f"sor{m.group(1)}"
-        return ""
-
-    blocks_by_kind = {}
+@lru_cache(maxsize=256)
+def _analysis_kind(s: str) -> str:
+    """Приводит заголовок вида «СОр 1»/«БЖБ 1»/«ТЖБ» к ключам sor1…sor3/soch."""
+    ns = _normalize_text(s, replace_yo=True)
+    # Russian: СОЧ, Kazakh: ТЖБ (Тоқсандық жиынтық бағалау)
+    if "соч" in ns or "тжб" in ns:
+        return "soch"
+    # Russian: СОР, Kazakh: БЖБ (Бөлім бойынша жиынтық бағалау)
+    m = _SOR_KIND_RE.search(ns)
+    if m:
+        return f"sor{m.group(1)}"
+    return ""
+
+
+def _blocks_by_kind(blocks: list[dict]) -> dict[str, dict]:
+    """Группирует сводки листов по ключам sor1…sor3/soch (при повторе побеждает последний лист)."""
+    by_kind = {}
     for b in blocks:
-        k = norm_kind(str(b.get("title", "")))
+        k = _analysis_kind(str(b.get("title", "")))
         if k:
-            blocks_by_kind[k] = b
+            by_kind[k] = b
+    return by_kind
 
-    for tbl in doc.tables:
-        if not tbl.rows or len(tbl.rows[0].cells) < 2:
-            continue
-        header = [_normalize_text(c.text, replace_yo=True) for c in tbl.rows[0].cells]
-        header_join = " ".join(header)
 
-        # Check for table markers - Russian or Kazakh
-        # Russian: "класс" and "писали"
-        # Kazakh: "бжб" and "орындағаны" (or similar structure)
-        is_russian_table = "класс" in header_join and "писали" in header_join
-        is_kazakh_table = ("бжб" in header_join or "орындағаны" in header_join) and "макс" in header_join
-        
-        if not is_russian_table and not is_kazakh_table:
-            continue
+def _is_analysis_table_header(header_text: str) -> bool:
+    """Шапка сводной таблицы анализа: RU — «класс» и «писали», KK — «бжб»/«орындағаны» и «макс».
 
-        def find_col(*substrs: str) -> int | None:
-            """Индекс колонки по любой из подстрок в заголовке."""
-            for i, h in enumerate(header):
-                for substr in substrs:
-                    if substr in h:
-                        return i
-            return None
+    Маркеры без пробелов и без «е/ё», поэтому ищутся в сыром тексте в нижнем регистре.
+    """
+    return ("класс" in header_text and "писали" in header_text) or (
+        ("бжб" in header_text or "орындағаны" in header_text) and "макс" in header_text
+    )
 
-        # Find columns - support both Russian and Kazakh headers
-        col_class = find_col("класс", "бжб")  # Class or БЖБ
-        col_pisali = find_col("писали", "орындағаны")  # Students count
-        col_max = find_col("макс")  # Max points
-        col_quality = find_col("кач", "сапа")  # Quality %
-        col_success = find_col("успев", "үлгерім")  # Success %
-        
-        # Grade columns - by level names
-        # Высокий/Жоғары = only "5"
-        # Средний/Орта = "3" + "4" combined
-        # Низкий/Төмен = only "2"
-        col_high = find_col("высок", "жоғары", "5")  # High = grade 5
-        col_mid = find_col("средн", "орта", "4")     # Medium = grades 3+4
-        col_low = find_col("низк", "төмен", "2")     # Low = grade 2
+
+def _fill_existing_analysis_table(doc: Document, blocks: list[dict]) -> bool:
+    """Заполняет готовую сводную таблицу анализа по блокам СОР1–3/СОЧ из Excel (RU/KK заголовки)."""
+    blocks_by_kind = _blocks_by_kind(blocks)
+
+    for tbl_el in doc.element.body.tbl_lst:
+        # Шапка — по узлам <w:t> ячеек первой строки (XPath в lxml), без обёрток ячеек python-docx
+        header_text = " ".join(
+            "".join(tc.xpath(".//w:t/text()")) for tc in tbl_el.xpath("./w:tr[1]/w:tc")
+        ).lower()
+        if not _is_analysis_table_header(header_text):
+            continue
+        tbl = Table(tbl_el, doc)
+        tbl_rows = list(tbl.rows)
+        if not tbl_rows:
+            continue
+        header_cells = tbl_rows[0].cells
+        if len(header_cells) < 2:
+            continue
+        header = [_normalize_text(c.text, replace_yo=True) for c in header_cells]
+
+        # Find columns - support both Russian and Kazakh headers.
+        # One pass over the header: each role takes the first column containing any of its keywords.
+        cols: dict[str, int] = {}
+        for i, h in enumerate(header):
+            for role, keywords in _ANALYSIS_COLUMN_KEYWORDS:
+                if role not in cols and any(k in h for k in keywords):
+                    cols[role] = i
+        col_class = cols.get("class")
+        col_pisali = cols.get("pisali")
+        col_max = cols.get("max")
+        col_quality = cols.get("quality")
+        col_success = cols.get("success")
+        col_high = cols.get("high")
+        col_mid = cols.get("mid")
+        col_low = cols.get("low")
         
         if col_class is None and col_pisali is None:
             continue
 
         # Fill rows by matching "СОР 1/2/3/СОЧ" or "БЖБ 1/2/3/ТЖБ" in the first column
         filled_kinds: set[str] = set()
-        for r in range(1, len(tbl.rows)):
-            cells = tbl.rows[r].cells
+        for row in tbl_rows[1:]:
+            cells = row.cells
             # Try first column for the kind identifier
             first_col = col_class if col_class is not None else 0
             class_cell_text = _normalize_text(cells[first_col].text, replace_yo=True)
-            k = norm_kind(class_cell_text)
+            k = _analysis_kind(class_cell_text)
             if not k:
                 continue
             # Per user: fill only the FIRST occurrence of each kind.
@@ -707,11 +792,26 @@ def _fill_existing_analysis_table(doc: Document, blocks: list[dict], lang: str =
     return False
 
 
-def _extract_names_from_excel_column(ws, col: str, start_row: int = 8, end_row: int = 39) -> list[str]:
+def _read_sheet_rows(ws) -> list[tuple]:
+    """Читает значения листа A1:N199 одним проходом (книга открыта в read_only)."""
+    return list(ws.iter_rows(min_row=1, max_row=_SHEET_MAX_ROW, max_col=_SHEET_MAX_COL, values_only=True))
+
+
+def _cell_value(rows: list[tuple], row: int, col: int):
+    """Значение ячейки (нумерация с 1) из прочитанных строк листа; за пределами данных — None."""
+    if row <= len(rows):
+        values = rows[row - 1]
+        if col <= len(values):
+            return values[col - 1]
+    return None
+
+
+def _extract_names_from_excel_column(rows: list[tuple], col: str, start_row: int = 8, end_row: int = 39) -> list[str]:
     """Собирает непустые ФИО из колонки листа (диапазон строк шаблона)."""
     names: list[str] = []
-    for r in range(start_row, end_row + 1):
-        v = ws[f"{col}{r}"].value
+    ci = column_index_from_string(col) - 1
+    for values in rows[start_row - 1:end_row]:
+        v = values[ci] if ci < len(values) else None
         if v is None:
             continue
         s = str(v).strip()
@@ -720,36 +820,39 @@ def _extract_names_from_excel_column(ws, col: str, start_row: int = 8, end_row:
     return names
 
 
-def _fill_level_table(doc: Document, wb, lang: str = "ru") -> bool:
+def _row_level_key(text: str) -> str | None:
+    """Уровень строки таблицы уровней (high/mid/low) по тексту первой колонки, RU или KK."""
+    # _normalize_text уже приводит к нижнему регистру и кэширован
+    t = _normalize_text(text, replace_yo=True, remove_spaces=True)
+    for prefix, level in _LEVEL_MAP:
+        if prefix in t:
+            return level
+    return None
+
+
+def _fill_level_table(doc: Document, sheet_rows: dict[str, list[tuple]]) -> bool:
     """Заполняет таблицу «уровень × СОР/СОЧ»: ФИО из колонок L/M/N листов Excel (высокий/средний/низкий)."""
-    is_kazakh = lang.lower() in ("kk", "kaz", "kazakh")
-    
     # Build mapping from kind -> {level -> names}
     excel_map: dict[str, dict[str, list[str]]] = {}
-    for name in wb.sheetnames:
-        n = _normalize_text(name, replace_yo=True, remove_spaces=True)
-        kind = None
-        # Kazakh: ТЖБ = СОЧ, БЖБ = СОР
-        if "соч" in n or "тжб" in n:
-            kind = "soch"
-        else:
-            m = re.search(r"(?:сор|бжб)(\d)", n)
-            if m:
-                kind = f"sor{m.group(1)}"
+    for name, rows in sheet_rows.items():
+        kind = _classify_sheet(name)
         if not kind:
             continue
-        ws = wb[name]
         excel_map[kind] = {
-            "high": _extract_names_from_excel_column(ws, "L"),
-            "mid": _extract_names_from_excel_column(ws, "M"),
-            "low": _extract_names_from_excel_column(ws, "N"),
+            "high": _extract_names_from_excel_column(rows, "L"),
+            "mid": _extract_names_from_excel_column(rows, "M"),
+            "low": _extract_names_from_excel_column(rows, "N"),
         }
 
     # Find a table with expected headers
     for tbl in doc.tables:
-        if not tbl.rows or len(tbl.rows[0].cells) < 4:
+        tbl_rows = list(tbl.rows)
+        if not tbl_rows:
             continue
-        header_raw = [c.text.strip() for c in tbl.rows[0].cells]
+        header_cells = tbl_rows[0].cells
+        if len(header_cells) < 4:
+            continue
+        header_raw = [c.text.strip() for c in header_cells]
         header = [_normalize_text(x, replace_yo=True, remove_spaces=True) for x in header_raw]
         header_join = " ".join(header)
         
@@ -761,39 +864,25 @@ def _fill_level_table(doc: Document, wb, lang: str = "ru") -> bool:
             continue
 
         # Column indices - support both Russian and Kazakh
-        def find_col(*keys: str) -> int | None:
-            for key in keys:
-                k = _normalize_text(key, replace_yo=True, remove_spaces=True)
+        def find_col(keys: tuple[str, ...]) -> int | None:
+            for k in keys:
                 for i, h in enumerate(header):
-                    if k == h or k in h:
+                    if k in h:
                         return i
             return None
 
-        col_sor1 = find_col("СОР1", "БЖБ1", "бжб1")
-        col_sor2 = find_col("СОР2", "БЖБ2", "бжб2")
-        col_sor3 = find_col("СОР3", "БЖБ3", "бжб3")
-        col_soch = find_col("СОЧ", "ТЖБ", "тжб")
-        col_level = find_col("Уровень", "Деңгей", "деңгей")
+        col_sor1 = find_col(_LEVEL_TABLE_SOR1_KEYS)
+        col_sor2 = find_col(_LEVEL_TABLE_SOR2_KEYS)
+        col_sor3 = find_col(_LEVEL_TABLE_SOR3_KEYS)
+        col_soch = find_col(_LEVEL_TABLE_SOCH_KEYS)
+        col_level = find_col(_LEVEL_TABLE_LEVEL_KEYS)
         if col_level is None:
             col_level = 0
 
-        # Row mapping by first column - support both Russian and Kazakh
-        def row_level_key(text: str) -> str | None:
-            t = _normalize_text(text, replace_yo=True, remove_spaces=True).lower()
-            # Russian: высокий/средний/низкий
-            # Kazakh: жоғары/орта/төмен
-            if "высок" in t or "жоғары" in t:
-                return "high"
-            if "средн" in t or "орта" in t:
-                return "mid"
-            if "низк" in t or "төмен" in t:
-                return "low"
-            return None
-
         filled_any = False
-        for r in range(1, len(tbl.rows)):
-            cells = tbl.rows[r].cells
-            lvl = row_level_key(cells[col_level].text if col_level < len(cells) else "")
+        for row in tbl_rows[1:]:
+            cells = row.cells
+            lvl = _row_level_key(cells[col_level].text if col_level < len(cells) else "")
             if not lvl:
                 continue
 
@@ -805,8 +894,8 @@ def _fill_level_table(doc: Document, wb, lang: str = "ru") -> bool:
                 if not names:
                     return
                 # Append or replace? User asked: "записываем учащихся ФИО".
-                # We'll replace the cell text with the names list.
-                _set_cell_text(cells[col_idx], "\n".join(names))
+                # We'll replace the cell text with the names list (one line per name).
+                _set_cell_lines(cells[col_idx], names)
                 filled_any = True
 
             put(col_sor1, "sor1")
@@ -819,39 +908,38 @@ def _fill_level_table(doc: Document, wb, lang: str = "ru") -> bool:
     return False
 
 
-def _extract_sheet_block(ws) -> dict:
+def _extract_sheet_block(sheet_title: str, rows: list[tuple]) -> dict:
     """Сводка по одному листу отчёта: организация, класс, учитель, сводные счётчики и J8/K8."""
     # Template conventions from your Excel pages:
-    org = ws["B1"].value
-    class_val = ws["C3"].value
-    teacher = ws["C5"].value
-    title = ws["C6"].value or ws.title
-    students_count = ws["C4"].value
+    org = _cell_value(rows, 1, 2)  # B1
+    class_val = _cell_value(rows, 3, 3)  # C3
+    teacher = _cell_value(rows, 5, 3)  # C5
+    title = _cell_value(rows, 6, 3) or sheet_title  # C6
+    students_count = _cell_value(rows, 4, 3)  # C4
 
     # If C4 missing, count B8.. until blank
     if not students_count:
         cnt = 0
-        for r in range(8, 200):
-            v = ws[f"B{r}"].value
-            if not v:
+        for values in rows[7:_SHEET_MAX_ROW]:
+            if len(values) < 2 or not values[1]:
                 break
             cnt += 1
         students_count = cnt
 
     # Max points (D8) if present
-    max_points = ws["D8"].value
+    max_points = _cell_value(rows, 8, 4)
 
     # Summary (as in template logic)
-    quality = ws["J8"].value
-    success = ws["K8"].value
-    c5 = ws["F41"].value
-    c4 = ws["G42"].value
-    c3 = ws["H43"].value
-    c2 = ws["I44"].value
+    quality = _cell_value(rows, 8, 10)  # J8
+    success = _cell_value(rows, 8, 11)  # K8
+    c5 = _cell_value(rows, 41, 6)  # F41
+    c4 = _cell_value(rows, 42, 7)  # G42
+    c3 = _cell_value(rows, 43, 8)  # H43
+    c2 = _cell_value(rows, 44, 9)  # I44
 
     return {
-        "sheet": ws.title,
-        "title": str(title) if title is not None else ws.title,
+        "sheet": sheet_title,
+        "title": str(title) if title is not None else sheet_title,
         "org": str(org) if org is not None else "",
         "class": str(class_val) if class_val is not None else "",
         "teacher": str(teacher) if teacher is not None else "",
@@ -876,28 +964,39 @@ def build_word_report(
     lang: str = "ru",
 ) -> Path:
     """Строит .docx из шаблона и Excel-отчёта: текстовые поля, таблицы, при необходимости — сводная таблица."""
-    report_xlsx = _resolve_xlsx(report_xlsx)
-    if not report_xlsx.exists():
+    resolved = _resolve_xlsx(report_xlsx)
+    if resolved is None:
         raise FileNotFoundError(f"Excel report not found: {report_xlsx}")
+    # _resolve_xlsx возвращает только существующий файл — повторный stat не нужен
+    report_xlsx = resolved
 
-    wb = load_workbook(report_xlsx, data_only=True)
-    # Only analyze SOR/SOCH sheets (per user: do NOT include formative or grades).
-    sheets = [wb[name] for name in wb.sheetnames if _is_sor_or_soch_sheet(name)]
-    blocks = [_extract_sheet_block(ws) for ws in sheets]
+    # Книга только читается: read_only + один проход по каждому нужному листу.
+    wb = load_workbook(report_xlsx, read_only=True, data_only=True, keep_links=False)
+    try:
+        # Only analyze SOR/SOCH sheets (per user: do NOT include formative or grades).
+        sheet_titles = [name for name in wb.sheetnames if _is_sor_or_soch_sheet(name)]
+        sor_titles = set(sheet_titles)
+        sheet_rows = {
+            name: _read_sheet_rows(wb[name])
+            for name in wb.sheetnames
+            if name in sor_titles or _classify_sheet(name)
+        }
+    finally:
+        wb.close()
+    blocks = [_extract_sheet_block(name, sheet_rows[name]) for name in sheet_titles]
 
-    # Best guess of global fields
-    org = next((b["org"] for b in blocks if b["org"]), "")
-    class_val = next((b["class"] for b in blocks if b["class"]), "")
-    teacher = next((b["teacher"] for b in blocks if b["teacher"]), "")
+    # Best guess of global fields: first non-empty value of each, in one pass
+    org = class_val = teacher = ""
+    for b in blocks:
+        org = org or b["org"]
+        class_val = class_val or b["class"]
+        teacher = teacher or b["teacher"]
+        if org and class_val and teacher:
+            break
+    # criteria_context.json читаем один раз: из него берутся и предмет, и период
+    ctx = _read_context(context_json or Path("out/mektep/criteria_context.json"))
     # Prefer subject saved during scraping (context json / subject.txt)
-    subject = ""
-    try:
-        ctx_path = context_json or Path("out/mektep/criteria_context.json")
-        if ctx_path and ctx_path.exists():
-            ctx = json.loads(ctx_path.read_text(encoding="utf-8"))
-            subject = str(ctx.get("subject", "") or "").strip()
-    except Exception:
-        subject = ""
+    subject = str(ctx.get("subject", "") or "").strip()
 
     if not subject:
         subject = _read_text(subject_txt or Path("out/mektep/subject.txt")) or ""
@@ -905,19 +1004,14 @@ def build_word_report(
     if not subject:
         subject = _extract_subject_from_filename(report_xlsx, class_val)
     # Period: prefer context json (period_label), then period.txt
-    period = None
-    try:
-        ctx_path = context_json or Path("out/mektep/criteria_context.json")
-        if ctx_path and ctx_path.exists():
-            ctx_for_period = json.loads(ctx_path.read_text(encoding="utf-8"))
-            period = str(ctx_for_period.get("period_label", "") or "").strip() or None
-    except Exception:
-        period = None
+    period = str(ctx.get("period_label", "") or "").strip() or None
     if not period:
         period = _read_text(period_txt) if period_txt else None
-    goal = _build_goal_from_sheets([ws.title for ws in sheets])
+    goal = _build_goal_from_sheets(sheet_titles)
 
-    doc = Document(template_docx)
+    doc = _open_template(template_docx)
+    # Абзацы (включая ячейки таблиц) собираем один раз для обоих проходов подстановки
+    paragraphs = list(_iter_paragraphs(doc))
 
     # Fill specific template lines requested by user
     _fill_template_lines(
@@ -928,7 +1022,8 @@ def build_word_report(
         class_text=class_val,
         teacher=teacher,
         goal=goal,
-        lang=lang,
+        is_kazakh=_is_kazakh(lang),
+        paragraphs=paragraphs,
     )
 
     mapping = {
@@ -942,34 +1037,34 @@ def build_word_report(
     if period:
         mapping["PERIOD"] = period
 
-    _replace_in_doc(doc, mapping)
+    _replace_in_doc(doc, mapping, paragraphs)
 
     # 7) Table analysis: fill an existing table if template has one; otherwise append.
-    filled = _fill_existing_analysis_table(doc, blocks, lang=lang)
-    _fill_level_table(doc, wb, lang=lang)
+    # Язык сводных таблиц определяется по их заголовкам (RU/KK)
+    filled = _fill_existing_analysis_table(doc, blocks)
+    _fill_level_table(doc, sheet_rows)
     if not filled:
         doc.add_paragraph("")
         p = doc.add_paragraph("")
         _set_paragraph_text(p, "Сводная таблица по листам отчета:")
         table = doc.add_table(rows=1, cols=8)
-        hdr = table.rows[0].cells
-        _set_cell_text(hdr[0], "Лист")
-        _set_cell_text(hdr[1], "Макс")
-        _set_cell_text(hdr[2], "Учащихся")
-        _set_cell_text(hdr[3], "Кач-ва %")
-        _set_cell_text(hdr[4], "Успев %")
-        _set_cell_text(hdr[5], "Высокий")  # Only grade 5
-        _set_cell_text(hdr[6], "Средний")  # Grades 3+4 combined
-        _set_cell_text(hdr[7], "Низкий")   # Only grade 2
+        # Пустая строка-прототип: строки данных — её копии, без add_row()/обёрток ячеек на каждую
+        tr_proto = deepcopy(table.rows[0]._tr)
+        _set_row_text(
+            table.rows[0].cells,
+            (
+                "Лист",
+                "Макс",
+                "Учащихся",
+                "Кач-ва %",
+                "Успев %",
+                "Высокий",  # Only grade 5
+                "Средний",  # Grades 3+4 combined
+                "Низкий",  # Only grade 2
+            ),
+        )
 
         for b in blocks:
-            row = table.add_row().cells
-            _set_cell_text(row[0], str(b["title"]))
-            _set_cell_text(row[1], str(b["max"]))
-            _set_cell_text(row[2], str(b["students"]))
-            _set_cell_text(row[3], str(b["quality"]))
-            _set_cell_text(row[4], str(b["success"]))
-            _set_cell_text(row[5], str(b["count_5"]))  # Высокий = 5
             # Средний = 3 + 4 combined
             c3 = b.get("count_3", 0) or 0
             c4 = b.get("count_4", 0) or 0
@@ -977,8 +1072,20 @@ def build_word_report(
                 mid_total = int(c3) + int(c4)
             except (ValueError, TypeError):
                 mid_total = f"{c4}+{c3}" if c3 and c4 else (c4 or c3 or "")
-            _set_cell_text(row[6], str(mid_total))
-            _set_cell_text(row[7], str(b["count_2"]))  # Низкий = 2
+            values = (
+                b["title"],
+                b["max"],
+                b["students"],
+                b["quality"],
+                b["success"],
+                b["count_5"],  # Высокий = 5
+                mid_total,
+                b["count_2"],  # Низкий = 2
+            )
+            tr = deepcopy(tr_proto)
+            for tc, value in zip(tr.tc_lst, values):
+                _set_p_element_text(tc.p_lst[0], str(value))
+            table._tbl.append(tr)
 
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / f"{_sanitize_filename(report_xlsx.stem)}.docx"
@@ -986,6 +1093,49 @@ def build_word_report(
     return out_path
 
 
+def build_word_reports_batch(
+    files: list[Path],
+    template_docx: Path,
+    out_dir: Path,
+    period_txt: Path | None = None,
+    subject_txt: Path | None = None,
+    context_jsons: list[Path | None] | None = None,
+    lang: str = "ru",
+    max_workers: int | None = None,
+) -> list[Path]:
+    """Строит отчёты для нескольких Excel-файлов в пуле процессов; результат — в порядке files.
+
+    Каждый отчёт независим и упирается в CPU (разбор xlsx, сборка docx), поэтому в дочерние
+    процессы передаются только пути; шаблон каждый процесс читает один раз (_template_bytes).
+    context_jsons — criteria_context.json каждого файла (в порядке files): предмет и период
+    у отчётов пакета разные, как при построении по одному через main.
+    """
+    files = [Path(f) for f in files]
+    if not files:
+        return []
+    if context_jsons is None:
+        context_jsons = [None] * len(files)
+    elif len(context_jsons) != len(files):
+        raise ValueError("context_jsons must have one entry per file")
+    kwargs = {
+        "template_docx": Path(template_docx),
+        "out_dir": Path(out_dir),
+        "period_txt": period_txt,
+        "subject_txt": subject_txt,
+        "lang": lang,
+    }
+    jobs = [
+        dict(kwargs, report_xlsx=f, context_json=Path(c) if c else None)
+        for f, c in zip(files, context_jsons)
+    ]
+    workers = min(len(files), max_workers or min(8, os.cpu_count() or 1))
+    if workers <= 1:
+        return [build_word_report(**job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(build_word_report, **job) for job in jobs]
+        return [fut.result() for fut in futures]
+
+
 def main() -> int:
     """CLI: шаблон Word, путь к xlsx, период/предмет из файлов или context JSON, язык ru/kk."""
     p = argparse.ArgumentParser()
@@ -1011,7 +1161,7 @@ def main() -> int:
 
     out_path = build_word_report(
         template_docx=template,
-        report_xlsx=_resolve_xlsx(Path(args.xlsx)),
+        report_xlsx=Path(args.xlsx),
         out_dir=Path(args.outdir),
         period_txt=Path(args.period) if args.period else None,
         subject_txt=Path(args.subjectfile) if args.subjectfile else None,
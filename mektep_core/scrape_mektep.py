@@ -6,6 +6,8 @@ import json
 import csv
 import re
 import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urljoin
 from datetime import datetime
@@ -70,8 +72,6 @@ except ImportError:
     def log_timing(label: str, seconds: float) -> None:
         print(f"[TIMING] {label}: {seconds:.2f}s")
 
-    from contextlib import contextmanager
-
     @contextmanager
     def timing_block(label: str):
         t0 = time.perf_counter()
@@ -98,6 +98,21 @@ except ImportError:
         STAGE_ERROR = "ERROR"
 
 
+def _call_now(fn, *args) -> None:
+    """emit по умолчанию: вызов логгера сразу, в текущем потоке."""
+    fn(*args)
+
+
+@contextmanager
+def _emit_timing(emit, label: str):
+    """timing_block, передающий запись [TIMING] через emit (см. build_reports)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit(log_timing, label, time.perf_counter() - t0)
+
+
 def _timed_sleep(seconds: float, reason: str) -> None:
     """Явный time.sleep с записью фактической длительности в лог [TIMING]."""
     t0 = time.perf_counter()
@@ -2248,6 +2263,11 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
                 page.screenshot(path=str(out_dir / "grades.png"), full_page=True)
             log_info("Сохранён скриншот: grades.png")
 
+        # Report thread for batch mode: building xlsx/docx is CPU work that needs no browser,
+        # so it overlaps with scraping the next class/subject. One workbook per task.
+        report_executor: ThreadPoolExecutor | None = None
+        report_futures: list = []
+
         def process_final_one(selected: dict, batch_subdir: Path) -> None:
             """Скрап «Четвертные оценки» (итог): таблица четвертей + экзамен + итоговая."""
             _ensure_dir(batch_subdir)
@@ -2434,14 +2454,27 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
                 log_warning(f'[{class_name} - {subject_name}] Нет учащихся: генерация Excel/Word пропущена')
                 return
 
-            # Build Excel report
+            if report_executor is not None:
+                # Batch mode: Excel/Word are built on the report thread while the browser moves on.
+                report_futures.append(
+                    report_executor.submit(build_reports_deferred, class_name, subject_name, batch_subdir)
+                )
+            else:
+                build_reports(class_name, subject_name, batch_subdir)
+
+        def build_reports(class_name: str, subject_name: str, batch_subdir: Path, emit=_call_now) -> None:
+            """Строит Excel и Word по JSON из batch_subdir (без обращения к браузеру).
+
+            Логгер вызывается только через emit(fn, *args): в потоке отчётов вызовы
+            копятся и выполняются в основном потоке (см. build_reports_deferred).
+            """
             try:
                 from mektep_core.build_report import build_report
                 template_path = _resolve_template_path("Шаблон.xlsx")
                 if template_path.exists():
-                    log_stage(ScraperLogger.STAGE_EXCEL_REPORT, f"Создание Excel: {class_name} - {subject_name}", None)
-                    log_info(f'[{class_name} - {subject_name}] Создание Excel отчета...')
-                    with timing_block(f"build_report (Excel) [{class_name} — {subject_name}]"):
+                    emit(log_stage, ScraperLogger.STAGE_EXCEL_REPORT, f"Создание Excel: {class_name} - {subject_name}", None)
+                    emit(log_info, f'[{class_name} - {subject_name}] Создание Excel отчета...')
+                    with _emit_timing(emit, f"build_report (Excel) [{class_name} — {subject_name}]"):
                         report_path = build_report(
                             template_path=template_path,
                             students_path=batch_subdir / "criteria_students.json",
@@ -2451,9 +2484,9 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
                             criteria_html_path=batch_subdir / "criteria.html",
                             org_name_path=batch_subdir / "org_name.txt",
                         )
-                    log_success(f'[{class_name} - {subject_name}] Excel отчет создан: {report_path.name}')
+                    emit(log_success, f'[{class_name} - {subject_name}] Excel отчет создан: {report_path.name}')
                     if logger:
-                        logger.report_created(class_name, subject_name, "Excel")
+                        emit(logger.report_created, class_name, subject_name, "Excel")
 
                     # Build Word report
                     try:
@@ -2463,14 +2496,14 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
                             tpl = _resolve_template_path("Шаблон_каз.docx")
                             if not tpl.exists():
                                 tpl = _resolve_template_path("Шаблон.docx")  # Fallback to Russian
-                                log_warning(f'Казахский шаблон не найден, используется русский')
+                                emit(log_warning, f'Казахский шаблон не найден, используется русский')
                         else:
                             tpl = _resolve_template_path("Шаблон.docx")
                         
                         if tpl.exists():
-                            log_stage(ScraperLogger.STAGE_WORD_REPORT, f"Создание Word: {class_name} - {subject_name}", None)
-                            log_info(f'[{class_name} - {subject_name}] Создание Word отчета ({tpl.name})...')
-                            with timing_block(f"build_word_report [{class_name} — {subject_name}]"):
+                            emit(log_stage, ScraperLogger.STAGE_WORD_REPORT, f"Создание Word: {class_name} - {subject_name}", None)
+                            emit(log_info, f'[{class_name} - {subject_name}] Создание Word отчета ({tpl.name})...')
+                            with _emit_timing(emit, f"build_word_report [{class_name} — {subject_name}]"):
                                 word_path = build_word_report(
                                     template_docx=tpl,
                                     report_xlsx=report_path,
@@ -2478,22 +2511,36 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
                                     context_json=batch_subdir / "criteria_context.json",
                                     lang=chosen,
                                 )
-                            log_success(f'[{class_name} - {subject_name}] Word отчет создан: {word_path.name}')
+                            emit(log_success, f'[{class_name} - {subject_name}] Word отчет создан: {word_path.name}')
                         else:
-                            log_warning(f'[{class_name} - {subject_name}] Шаблон Word не найден: {tpl}')
+                            emit(log_warning, f'[{class_name} - {subject_name}] Шаблон Word не найден: {tpl}')
                     except Exception as e:
                         import traceback
-                        log_error(f'[{class_name} - {subject_name}] ОШИБКА создания Word отчета', e)
+                        emit(log_error, f'[{class_name} - {subject_name}] ОШИБКА создания Word отчета', e)
                         if os.getenv("DEBUG", "").lower() == "1":
-                            print(traceback.format_exc())
+                            emit(print, traceback.format_exc())
                         # Continue even if Word report fails - Excel is still saved
                 else:
-                    log_error(f'[{class_name} - {subject_name}] Шаблон Excel не найден: {template_path}')
+                    emit(log_error, f'[{class_name} - {subject_name}] Шаблон Excel не найден: {template_path}')
             except Exception as e:
                 import traceback
-                log_error(f'[{class_name} - {subject_name}] ОШИБКА создания отчетов', e)
+                emit(log_error, f'[{class_name} - {subject_name}] ОШИБКА создания отчетов', e)
                 if os.getenv("DEBUG", "").lower() == "1":
-                    print(traceback.format_exc())
+                    emit(print, traceback.format_exc())
+
+        def build_reports_deferred(class_name: str, subject_name: str, batch_subdir: Path) -> list:
+            """build_reports для потока отчётов: вызовы логгера возвращаются списком (fn, args)."""
+            calls: list = []
+            build_reports(
+                class_name, subject_name, batch_subdir,
+                emit=lambda fn, *args: calls.append((fn, args)),
+            )
+            return calls
+
+        def replay_report_log(future) -> None:
+            """Выполняет в основном потоке вызовы логгера, накопленные задачей потока отчётов."""
+            for fn, args in future.result():
+                fn(*args)
 
         # Extract table rows and either process one (interactive) or all (batch).
         scrape_final = period_code == "6"
@@ -2528,28 +2575,49 @@ def run(headless: bool, out_dir: Path, slow_mo_ms: int) -> int:
             log_info("=" * 60)
             _update_progress(10, f"Начало обработки {total_reports} отчетов...", total_reports, 0)
             
-            for idx, r in enumerate(rows_to_process, 1):
-                class_name = r.get("class", "Unknown")
-                subject_name = r.get("subject", "Unknown")
-                log_info("")
-                log_info(f"[{idx}/{total_reports}] === Обработка: {class_name} - {subject_name} ===")
-                log_info("-" * 60)
-                sub = batch_root / _safe_slug(f'{class_name} {subject_name}')
-                processor = process_final_one if scrape_final else process_one
-                with timing_block(
-                    f"{'process_final_one' if scrape_final else 'process_one'} "
-                    f"[{idx}/{total_reports}] {class_name} — {subject_name}"
-                ):
-                    processor(r, sub)
-
-                # Calculate progress: 10% (auth) to 90% (reports processing)
-                progress_percent = min(90, 10 + int((idx / total_reports) * 80))
-                _update_progress(
-                    progress_percent,
-                    f"Обработано отчетов: {idx} из {total_reports}",
-                    total_reports,
-                    idx,
-                )
+            if not scrape_final:
+                report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mektep-reports")
+            try:
+                for idx, r in enumerate(rows_to_process, 1):
+                    class_name = r.get("class", "Unknown")
+                    subject_name = r.get("subject", "Unknown")
+                    log_info("")
+                    log_info(f"[{idx}/{total_reports}] === Обработка: {class_name} - {subject_name} ===")
+                    log_info("-" * 60)
+                    sub = batch_root / _safe_slug(f'{class_name} {subject_name}')
+                    processor = process_final_one if scrape_final else process_one
+                    with timing_block(
+                        f"{'process_final_one' if scrape_final else 'process_one'} "
+                        f"[{idx}/{total_reports}] {class_name} — {subject_name}"
+                    ):
+                        processor(r, sub)
+                    # Журнал готовых отчётов — сразу, не дожидаясь конца пакета
+                    while report_futures and report_futures[0].done():
+                        replay_report_log(report_futures.pop(0))
+
+                    # Calculate progress: 10% (auth) to 90% (reports processing)
+                    progress_percent = min(90, 10 + int((idx / total_reports) * 80))
+                    _update_progress(
+                        progress_percent,
+                        f"Обработано отчетов: {idx} из {total_reports}",
+                        total_reports,
+                        idx,
+                    )
+            finally:
+                if report_executor is not None:
+                    with timing_block("ожидание генерации Excel/Word"):
+                        queued = len(report_futures)
+                        for built, fut in enumerate(report_futures, 1):
+                            replay_report_log(fut)
+                            _update_progress(
+                                90,
+                                f"Создание Excel/Word: {built} из {queued}",
+                                total_reports,
+                                total_reports,
+                            )
+                        report_futures.clear()
+                    report_executor.shutdown(wait=True)
+                    report_executor = None
             log_info("")
             log_info("=" * 60)
             log_success(f"ПАКЕТНЫЙ РЕЖИМ ЗАВЕРШЕН: Создано отчетов")
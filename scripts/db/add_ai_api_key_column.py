@@ -3,25 +3,50 @@ Migration script: Add ai_api_key column to schools table
 
 Запуск: python -m scripts.db.add_ai_api_key_column
 """
+from scripts.db.schema_migrations import already_applied, mark_applied
 from webapp import create_app, db
 
+MIGRATION_NAME = "add_ai_api_key_column"
+
+
+def _has_ai_api_key_column(conn) -> bool:
+    """Точечная проверка колонки schools.ai_api_key без полной рефлексии таблицы."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(db.text("PRAGMA table_info(schools)")).fetchall()
+        return any(row[1] == "ai_api_key" for row in rows)
+    # information_schema видит все базы сервера — ограничиваемся текущей схемой
+    schema = "DATABASE()" if conn.dialect.name == "mysql" else "current_schema()"
+    row = conn.execute(
+        db.text(
+            "SELECT 1 FROM information_schema.columns "
+            f"WHERE table_schema = {schema} "
+            "AND table_name = 'schools' AND column_name = 'ai_api_key' LIMIT 1"
+        )
+    ).first()
+    return row is not None
+
 
 def add_ai_api_key_column():
     """Добавить колонку ai_api_key в таблицу schools"""
     app = create_app()
 
     with app.app_context():
-        inspector = db.inspect(db.engine)
-        columns = [col["name"] for col in inspector.get_columns("schools")]
+        with db.engine.connect() as conn:
+            if already_applied(conn, MIGRATION_NAME):
+                conn.commit()
+                print("✓ Миграция 'add_ai_api_key_column' уже применена")
+                return
 
-        if "ai_api_key" in columns:
-            print("✓ Колонка 'ai_api_key' уже существует в таблице schools")
-            return
+            if _has_ai_api_key_column(conn):
+                mark_applied(conn, MIGRATION_NAME)
+                conn.commit()
+                print("✓ Колонка 'ai_api_key' уже существует в таблице schools")
+                return
 
-        print("Добавление колонки 'ai_api_key' в таблицу schools...")
+            print("Добавление колонки 'ai_api_key' в таблицу schools...")
 
-        with db.engine.connect() as conn:
             conn.execute(db.text("ALTER TABLE schools ADD COLUMN ai_api_key VARCHAR(512)"))
+            mark_applied(conn, MIGRATION_NAME)
             conn.commit()
 
         print("✓ Колонка 'ai_api_key' успешно добавлена!")
@@ -30,4 +55,3 @@ def add_ai_api_key_column():
 
 if __name__ == "__main__":
     add_ai_api_key_column()
-
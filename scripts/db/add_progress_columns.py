@@ -1,12 +1,31 @@
-"""Скрипт добавления колонок прогресса в таблицу scrape_jobs (SQLite ALTER TABLE)."""
+"""Скрипт добавления колонок прогресса в таблицу scrape_jobs (SQLite, PostgreSQL, MySQL)."""
 from sqlalchemy import text
 
+from scripts.db.schema_migrations import already_applied, mark_applied
 from webapp import create_app
 from webapp.extensions import db
 
+MIGRATION_NAME = "add_progress_columns"
+
+
+def _existing_columns(conn, dialect: str) -> set[str]:
+    """Имена колонок scrape_jobs: PRAGMA для SQLite, information_schema для остальных СУБД."""
+    if dialect == "sqlite":
+        result = conn.execute(text("PRAGMA table_info(scrape_jobs)")).fetchall()
+        return {row[1] for row in result}
+    # information_schema видит все базы сервера — ограничиваемся текущей схемой
+    schema = "DATABASE()" if dialect == "mysql" else "current_schema()"
+    result = conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            f"WHERE table_schema = {schema} AND table_name = 'scrape_jobs'"
+        )
+    ).fetchall()
+    return {row[0] for row in result}
+
 
 def main() -> None:
-    """Проверяет PRAGMA table_info и добавляет недостающие колонки прогресса в scrape_jobs."""
+    """Проверяет схему один раз и добавляет недостающие колонки прогресса в scrape_jobs."""
     app = create_app()
 
     with app.app_context():
@@ -19,37 +38,40 @@ def main() -> None:
             ("processed_reports", "INTEGER DEFAULT 0"),
         ]
 
-        for col_name, col_type in columns_to_add:
-            try:
-                result = db.session.execute(text("PRAGMA table_info(scrape_jobs)")).fetchall()
-                existing_columns = [row[1] for row in result]
+        try:
+            dialect = db.engine.dialect.name
+            # Одна проверка схемы и одна транзакция на все ALTER TABLE.
+            with db.engine.begin() as conn:
+                if already_applied(conn, MIGRATION_NAME):
+                    print("  ✓ Migration 'add_progress_columns' already applied")
+                    return
+                existing_columns = _existing_columns(conn, dialect)
+
+                missing = []
+                for col_name, col_type in columns_to_add:
+                    if col_name in existing_columns:
+                        print(f"  ✓ Column '{col_name}' already exists")
+                    else:
+                        missing.append((col_name, col_type))
 
-                if col_name in existing_columns:
-                    print(f"  ✓ Column '{col_name}' already exists")
+                if missing and dialect in ("postgresql", "mysql"):
+                    # PostgreSQL/MySQL принимают несколько ADD COLUMN в одном ALTER TABLE.
+                    clauses = ", ".join(f"ADD COLUMN {col_name} {col_type}" for col_name, col_type in missing)
+                    conn.execute(text(f"ALTER TABLE scrape_jobs {clauses}"))
                 else:
-                    db.session.execute(
-                        text(f"ALTER TABLE scrape_jobs ADD COLUMN {col_name} {col_type}")
-                    )
-                    print(f"  ✓ Added column '{col_name}'")
-            except Exception:
-                try:
-                    db.session.execute(
-                        text(f"ALTER TABLE scrape_jobs ADD COLUMN {col_name} {col_type}")
-                    )
-                    db.session.commit()
+                    # SQLite: по одному ADD COLUMN на ALTER, но в общей транзакции.
+                    for col_name, col_type in missing:
+                        conn.execute(text(f"ALTER TABLE scrape_jobs ADD COLUMN {col_name} {col_type}"))
+
+                for col_name, _ in missing:
                     print(f"  ✓ Added column '{col_name}'")
-                except Exception as e2:
-                    print(f"  ✗ Failed to add '{col_name}': {e2}")
+                mark_applied(conn, MIGRATION_NAME)
 
-        try:
-            db.session.commit()
             print("\n✓ Database update completed!")
             print("You can now use the application with progress tracking.")
         except Exception as e:
-            print(f"\n✗ Error committing changes: {e}")
-            db.session.rollback()
+            print(f"\n✗ Error updating scrape_jobs: {e}")
 
 
 if __name__ == "__main__":
     main()
-
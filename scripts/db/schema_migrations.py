@@ -0,0 +1,25 @@
+"""Учёт применённых скриптов миграции в таблице schema_migrations.
+
+Отмеченный скрипт при повторном запуске завершается сразу, не проверяя схему таблиц.
+"""
+from sqlalchemy import text
+
+
+def already_applied(conn, name: str) -> bool:
+    """Создаёт schema_migrations при отсутствии и проверяет, записана ли в ней миграция name."""
+    conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "name VARCHAR(128) PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    row = conn.execute(
+        text("SELECT 1 FROM schema_migrations WHERE name = :name"), {"name": name}
+    ).first()
+    return row is not None
+
+
+def mark_applied(conn, name: str) -> None:
+    """Записывает миграцию name как применённую (в транзакции conn)."""
+    conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
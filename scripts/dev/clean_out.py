@@ -1,5 +1,8 @@
 import argparse
+import os
 import shutil
+import subprocess
+import sys
 from pathlib import Path
 
 
@@ -17,15 +20,44 @@ def main() -> int:
             print("Cancelled.")
             return 1
 
+    old = None
     if target.exists():
-        shutil.rmtree(target, ignore_errors=True)
+        # Старое дерево сначала переименовываем (мгновенно), а удаляем в фоне после пересоздания
+        old = target.with_name(f"{target.name}.old.{os.getpid()}")
+        try:
+            os.replace(target, old)
+        except OSError:
+            # Не удалось переименовать (другой диск, занятые файлы на Windows) — удаляем на месте
+            old = None
+            shutil.rmtree(target, ignore_errors=True)
 
     (target / "reports").mkdir(parents=True, exist_ok=True)
     (target / "batch").mkdir(parents=True, exist_ok=True)
     print(f"Cleaned and recreated: {target}")
+    if old is not None:
+        _remove_detached(old)
     return 0
 
 
+def _remove_detached(path: Path) -> None:
+    """Удаляет дерево в отдельном процессе, не дожидаясь его: скрипт завершается сразу."""
+    if sys.platform == "win32":
+        flags = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        flags = {"start_new_session": True}
+    try:
+        subprocess.Popen(
+            [sys.executable, "-c", "import shutil, sys; shutil.rmtree(sys.argv[1], ignore_errors=True)", str(path)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **flags,
+        )
+    except OSError:
+        shutil.rmtree(path, ignore_errors=True)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
 
@@ -1,52 +1,54 @@
 """
 Скрипт для компиляции переводов .po в .mo файлы.
 """
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# msgfmt ищем один раз, а не ловим FileNotFoundError на каждой локали
+MSGFMT = shutil.which("msgfmt")
+
+
+def _compile_with_polib(po_file: Path, mo_file: Path, hint: str) -> list[str]:
+    """Компилирует .po через polib; возвращает строки для вывода."""
+    try:
+        import polib
+    except ImportError:
+        return [f"  ✗ Ошибка: {hint}", "     pip install polib"]
+    po = polib.pofile(str(po_file))
+    po.save_as_mofile(str(mo_file))
+    return [f"  ✓ Создан {mo_file} (через polib)"]
+
+
+def _compile_one(po_file: Path) -> list[str]:
+    """Компилирует один messages.po рядом в messages.mo (msgfmt, иначе polib)."""
+    mo_file = po_file.with_suffix(".mo")
+    lines = [f"Компиляция {po_file}..."]
+    if MSGFMT is None:
+        return lines + _compile_with_polib(po_file, mo_file, "установите polib")
+    result = subprocess.run(
+        [MSGFMT, "-o", str(mo_file), str(po_file)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode == 0:
+        return lines + [f"  ✓ Создан {mo_file}"]
+    return lines + _compile_with_polib(po_file, mo_file, "установите msgfmt или polib")
+
 
 def main() -> None:
     """Компилирует все messages.po в webapp/translations в messages.mo через msgfmt или polib."""
     translations_dir = Path(__file__).resolve().parents[2] / "webapp" / "translations"
+    po_files = sorted(translations_dir.glob("*/LC_MESSAGES/messages.po"))
 
-    for locale_dir in translations_dir.glob("*/LC_MESSAGES"):
-        po_file = locale_dir / "messages.po"
-        mo_file = locale_dir / "messages.mo"
-
-        if po_file.exists():
-            print(f"Компиляция {po_file}...")
-            try:
-                result = subprocess.run(
-                    ["msgfmt", "-o", str(mo_file), str(po_file)],
-                    capture_output=True,
-                    text=True,
-                )
-                if result.returncode == 0:
-                    print(f"  ✓ Создан {mo_file}")
-                else:
-                    try:
-                        import polib
-
-                        po = polib.pofile(str(po_file))
-                        po.save_as_mofile(str(mo_file))
-                        print(f"  ✓ Создан {mo_file} (через polib)")
-                    except ImportError:
-                        print("  ✗ Ошибка: установите msgfmt или polib")
-                        print("     pip install polib")
-            except FileNotFoundError:
-                try:
-                    import polib
-
-                    po = polib.pofile(str(po_file))
-                    po.save_as_mofile(str(mo_file))
-                    print(f"  ✓ Создан {mo_file} (через polib)")
-                except ImportError:
-                    print("  ✗ Ошибка: установите polib")
-                    print("     pip install polib")
+    # Локали независимы: msgfmt — внешний процесс, потоков достаточно
+    with ThreadPoolExecutor(max_workers=min(8, len(po_files) or 1)) as ex:
+        for lines in ex.map(_compile_one, po_files):
+            print("\n".join(lines))
 
     print("\nГотово!")
 
 
 if __name__ == "__main__":
     main()
-
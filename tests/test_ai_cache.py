@@ -0,0 +1,46 @@
+"""Tests for ai.cache (desktop)."""
+
+import pytest
+
+from ai.cache import SemanticCache, goal_skeleton
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        ("1. Решать уравнения", "решать уравнения"),
+        ("2) Решать уравнения", "решать уравнения"),
+        ("- Решать уравнения;", "решать уравнения"),
+        ("• Решать уравнения", "решать уравнения"),
+        ("7.2.1.1 Решать уравнения", "решать уравнения"),
+        ("1. 7.2.1.1. Решать уравнения", "решать уравнения"),
+        ("2 таңбалы сандарды қосу", "2 таңбалы сандарды қосу"),
+        ("Сравнивать числа в пределах 100", "сравнивать числа в пределах 100"),
+    ],
+)
+def test_goal_skeleton_strips_only_numbering(raw, expected):
+    assert goal_skeleton(raw) == expected
+
+
+def test_goal_skeleton_keeps_leading_numbers_significant():
+    assert goal_skeleton("2 таңбалы сандарды қосу") != goal_skeleton("3 таңбалы сандарды қосу")
+    assert goal_skeleton("1. 2 таңбалы сандарды қосу") == goal_skeleton("2 таңбалы сандарды қосу")
+
+
+def test_semantic_cache_hits_near_duplicate(tmp_path):
+    cache = SemanticCache(tmp_path / "semantic.jsonl")
+    cache.put("qwen", "1. Решать линейные уравнения\n2. Строить графики функций", {"reasons": "r"})
+
+    assert cache.get("qwen", "- решать линейные уравнения;\n- строить графики функций.") == {"reasons": "r"}
+    assert cache.get("other-model", "1. Решать линейные уравнения\n2. Строить графики функций") is None
+    # Записи переживают перезапуск
+    reloaded = SemanticCache(tmp_path / "semantic.jsonl")
+    assert reloaded.get("qwen", "Решать линейные уравнения\nСтроить графики функций") == {"reasons": "r"}
+
+
+def test_semantic_cache_numbers_must_match():
+    cache = SemanticCache()
+    cache.put("qwen", "Сравнивать и упорядочивать числа в пределах 10", {"reasons": "r"})
+
+    assert cache.get("qwen", "Сравнивать и упорядочивать числа в пределах 100") is None
+    assert cache.get("qwen", "1. Сравнивать и упорядочивать числа в пределах 10") == {"reasons": "r"}
@@ -0,0 +1,141 @@
+"""Tests for ai.text_generator (desktop) with a fake OpenAI client."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import ai.text_generator as tg
+from ai.cache import ResponseCache
+
+openai = pytest.importorskip("openai")
+import httpx  # noqa: E402  (ставится вместе с openai)
+
+ANSWER = '{"difficulties_list": "d", "reasons": "r", "correction": "c"}'
+
+
+class FakeStream:
+    def __init__(self, parts):
+        self.parts = parts
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            self.read += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """chat.completions.create: по очереди отдаёт ответы (строка — поток, исключение — ошибка)."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return FakeStream([response])
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://test"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch):
+    tg._import_openai()
+    monkeypatch.setattr(tg, "_RESPONSE_CACHE", ResponseCache(None))
+    monkeypatch.setattr(tg, "_STRUCTURAL_CACHE", ResponseCache(None))
+    monkeypatch.setattr(tg, "_BREAKERS", {})
+
+
+def _generator(*clients):
+    providers = [tg.ProviderConfig(f"model-{i}", "key") for i in range(len(clients))]
+    generator = tg.AITextGenerator("key", providers=providers)
+    generator._clients = list(zip(providers, clients))
+    generator.client = clients[0]
+    generator._client_initialized = True
+    return generator
+
+
+def test_json_object_end_ignores_braces_in_strings():
+    scanner = tg._JsonObjectEnd()
+    assert scanner.feed('{"a": "}{\\"') == -1
+    assert scanner.feed('", "b": {"c": 1}') == -1
+    assert scanner.feed("} trailing") == 1
+
+
+def test_collect_stream_stops_after_object():
+    stream = FakeStream(['{"a": ', '"x"} tail', "never read"])
+    assert tg._collect_stream(stream) == '{"a": "x"}'
+    assert stream.read == 2
+    assert stream.closed
+
+
+def test_circuit_breaker_opens_and_half_opens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(tg.time, "monotonic", lambda: now[0])
+    breaker = tg.CircuitBreaker(fail_threshold=2, cooldown=10.0)
+
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] += 10.0
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # одна пробная попытка
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_cache_hit_and_bypass():
+    client = FakeClient(ANSWER)
+    generator = _generator(client)
+
+    first = generator.generate_analysis("Достигнутые", "1. Решать уравнения")
+    assert first["success"] and first["reasons"] == "r" and client.calls == 1
+
+    assert generator.generate_analysis("Достигнутые", "1. Решать уравнения") == first
+    # Другая нумерация — попадание в структурный кэш
+    assert generator.generate_analysis("Достигнутые", "- Решать уравнения") == first
+    assert client.calls == 1
+
+    generator.generate_analysis("Достигнутые", "1. Решать уравнения", use_cache=False)
+    generator.generate_analysis("Достигнутые", "Строить графики")
+    assert client.calls == 3
+
+
+def test_falls_back_to_next_provider_without_caching():
+    primary = FakeClient(_connection_error())
+    backup = FakeClient(ANSWER)
+    generator = _generator(primary, backup)
+
+    result = generator.generate_analysis("", "Решать уравнения", max_retries=2, base_delay=0.0)
+    assert result["provider"] == "model-1"
+    assert primary.calls == 2 and backup.calls == 1
+    # Ответ резервной модели не кэшируется
+    generator.generate_analysis("", "Решать уравнения", max_retries=1, base_delay=0.0)
+    assert backup.calls == 2
+
+
+def test_template_fallback_when_all_providers_fail():
+    client = FakeClient(_connection_error())
+    generator = _generator(client)
+
+    result = generator.generate_analysis("", "1. Бөлшектерді қосу", max_retries=1)
+    assert result["fallback"] is True
+    assert result["difficulties_list"].startswith("Оқушылар")
+    assert "бөлшектерді қосу" in result["difficulties_list"]
@@ -1,12 +1,15 @@
 """Тесты Desktop API: авторизация и защищённые эндпоинты."""
 
+import gzip
+import json
+
 import pytest
 
 from webapp import create_app
 from webapp.config import TestingConfig
 from webapp.constants import DESKTOP_VERSION
 from webapp.extensions import db
-from webapp.models import Role, School, User
+from webapp.models import GradeReport, Role, School, User
 
 
 @pytest.fixture
@@ -123,3 +126,111 @@ class TestApiReportUpload:
         )
         assert resp.status_code == 400
         assert "автоматически" in resp.get_json().get("error", "").lower()
+
+    def test_upload_batch_reports_per_item_results(self, app, client):
+        with app.app_context():
+            _make_teacher("batch_user")
+            login = client.post(
+                "/api/auth/login",
+                json={"username": "batch_user", "password": "secret123"},
+                headers={"X-Desktop-Version": DESKTOP_VERSION},
+            )
+            token = login.get_json()["token"]
+
+        report = {
+            "class_name": "7А",
+            "subject_name": "Математика",
+            "period_type": "quarter",
+            "period_number": 2,
+            "grades_json": {"students": [{"name": "Алиев А.", "grade": 5}]},
+            "has_quarter_grade_header": True,
+        }
+        resp = client.post(
+            "/api/reports/upload_batch",
+            json={"reports": [report, dict(report, period_type="year", period_number=5), report]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+        results = resp.get_json()["results"]
+        assert [r["success"] for r in results] == [True, False, True]
+        assert results[0]["action"] == "created"
+        assert results[1]["status"] == 400
+        assert results[2]["action"] == "updated"
+        assert results[2]["report_id"] == results[0]["report_id"]
+
+    def test_upload_batch_db_error_is_per_item(self, app, client, monkeypatch):
+        from sqlalchemy.exc import OperationalError
+
+        from webapp.views.api import reports as reports_view
+
+        with app.app_context():
+            _make_teacher("batch_db_user")
+            login = client.post(
+                "/api/auth/login",
+                json={"username": "batch_db_user", "password": "secret123"},
+                headers={"X-Desktop-Version": DESKTOP_VERSION},
+            )
+            token = login.get_json()["token"]
+
+        real_upsert = reports_view.upsert_grade_report
+
+        def flaky_upsert(user, data):
+            if data["class_name"] == "8Б":
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            return real_upsert(user, data)
+
+        monkeypatch.setattr(reports_view, "upsert_grade_report", flaky_upsert)
+        report = {
+            "class_name": "7А",
+            "subject_name": "Математика",
+            "period_type": "quarter",
+            "period_number": 2,
+            "grades_json": {"students": [{"name": "Алиев А.", "grade": 5}]},
+            "has_quarter_grade_header": True,
+        }
+        resp = client.post(
+            "/api/reports/upload_batch",
+            json={"reports": [report, dict(report, class_name="8Б"), dict(report, class_name="9В")]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+        results = resp.get_json()["results"]
+        assert [r["success"] for r in results] == [True, False, True]
+        assert results[1]["status"] == 500
+        with app.app_context():
+            assert sorted(r.class_name for r in GradeReport.query.all()) == ["7А", "9В"]
+
+    def test_upload_accepts_gzip_body(self, app, client):
+        with app.app_context():
+            _make_teacher("gzip_user")
+            login = client.post(
+                "/api/auth/login",
+                json={"username": "gzip_user", "password": "secret123"},
+                headers={"X-Desktop-Version": DESKTOP_VERSION},
+            )
+            token = login.get_json()["token"]
+
+        body = json.dumps({
+            "class_name": "7А",
+            "subject_name": "Математика",
+            "period_type": "quarter",
+            "period_number": 2,
+            "grades_json": {"students": [{"name": "Алиев А.", "grade": 5}]},
+            "has_quarter_grade_header": True,
+        }).encode("utf-8")
+        resp = client.post(
+            "/api/reports/upload",
+            data=gzip.compress(body, compresslevel=1),
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {token}", "Content-Encoding": "gzip"},
+        )
+        assert resp.status_code == 200
+        assert resp.get_json()["action"] == "created"
+
+        resp = client.post(
+            "/api/reports/upload",
+            data=b"not gzip",
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {token}", "Content-Encoding": "gzip"},
+        )
+        assert resp.status_code == 400
@@ -0,0 +1,36 @@
+"""Tests for mektep_core.build_report."""
+
+from openpyxl import Workbook
+
+from mektep_core.build_report import _fill_template_page
+
+
+def _fill(mode: str, results: list):
+    ws = Workbook().active
+    for r in range(8, 11):
+        ws.cell(row=r, column=4).value = "old"
+    _fill_template_page(
+        ws,
+        organization_name=None,
+        class_liter=None,
+        teacher_fio=None,
+        page_title="СОР 1",
+        fio_list=["Иванов", "Петров", "Сидоров"],
+        result_list=results,
+        max_value=10,
+        mode=mode,
+    )
+    return ws
+
+
+def test_percent_mode_levels():
+    ws = _fill("percent", [90, 70, 20])
+    assert [ws.cell(row=r, column=5).value for r in range(8, 11)] == [90.0, 70.0, 20.0]
+    assert [ws["F41"].value, ws["G42"].value, ws["H43"].value, ws["I44"].value] == [1, 1, 0, 1]
+
+
+def test_unknown_mode_counts_results_as_zero_percent():
+    ws = _fill("unexpected", [9, 7, 2])
+    assert [ws.cell(row=r, column=4).value for r in range(8, 11)] == [None, None, None]
+    assert [ws.cell(row=r, column=5).value for r in range(8, 11)] == [0.0, 0.0, 0.0]
+    assert [ws["F41"].value, ws["G42"].value, ws["H43"].value, ws["I44"].value] == [0, 0, 0, 3]
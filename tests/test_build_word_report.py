@@ -0,0 +1,57 @@
+"""Tests for mektep_core.build_word_report."""
+
+import json
+from pathlib import Path
+
+import pytest
+from docx import Document
+from openpyxl import Workbook
+
+from mektep_core.build_word_report import _iter_paragraphs, build_word_reports_batch
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _docx_text(path: Path) -> str:
+    return "\n".join(p.text for p in _iter_paragraphs(Document(path)))
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batch_uses_context_of_each_file(tmp_path, max_workers):
+    files, contexts = [], []
+    for subject, period in (("Алгебра", "1 четверть"), ("Физика", "2 четверть")):
+        wb = Workbook()
+        wb.active.title = "СОР 1"
+        xlsx = tmp_path / f"7А {subject}.xlsx"
+        wb.save(xlsx)
+        files.append(xlsx)
+        ctx = tmp_path / f"{subject}_context.json"
+        ctx.write_text(
+            json.dumps({"subject": subject, "period_label": period}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        contexts.append(ctx)
+
+    out = build_word_reports_batch(
+        files,
+        REPO_ROOT / "Шаблон.docx",
+        tmp_path / "out",
+        context_jsons=contexts,
+        max_workers=max_workers,
+    )
+
+    algebra, physics = (_docx_text(p) for p in out)
+    assert "Алгебра" in algebra and "1 четверть" in algebra
+    assert "Физика" not in algebra and "2 четверть" not in algebra
+    assert "Физика" in physics and "2 четверть" in physics
+    assert "Алгебра" not in physics and "1 четверть" not in physics
+
+
+def test_batch_rejects_misaligned_contexts(tmp_path):
+    with pytest.raises(ValueError):
+        build_word_reports_batch(
+            [tmp_path / "a.xlsx", tmp_path / "b.xlsx"],
+            REPO_ROOT / "Шаблон.docx",
+            tmp_path / "out",
+            context_jsons=[tmp_path / "a.json"],
+        )
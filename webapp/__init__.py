@@ -62,7 +62,10 @@ def create_app(config_object=None) -> Flask:
 
     # SQLite (dev): WAL позволяет читать во время записи — убирает
     # "database is locked" при параллельных фоновых потоках/задачах.
-    if (app.config.get("SQLALCHEMY_DATABASE_URI") or "").startswith("sqlite"):
+    # synchronous=NORMAL безопасен в WAL и не делает fsync на каждый коммит;
+    # временные таблицы и кэш страниц (~20 МБ) держим в памяти, файл БД читаем через mmap.
+    is_sqlite = (app.config.get("SQLALCHEMY_DATABASE_URI") or "").startswith("sqlite")
+    if is_sqlite:
         from sqlalchemy import event
 
         with app.app_context():
@@ -74,6 +77,10 @@ def create_app(config_object=None) -> Flask:
             try:
                 cursor.execute("PRAGMA journal_mode=WAL")
                 cursor.execute("PRAGMA busy_timeout=5000")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute("PRAGMA temp_store=MEMORY")
+                cursor.execute("PRAGMA mmap_size=268435456")
+                cursor.execute("PRAGMA cache_size=-20000")
             finally:
                 cursor.close()
 
@@ -396,6 +403,17 @@ def create_app(config_object=None) -> Flask:
             except Exception:
                 pass
 
+        # SQLite: обновить статистику планировщика после создания таблиц/индексов.
+        if is_sqlite:
+            from sqlalchemy import text
+
+            try:
+                db.session.execute(text("PRAGMA optimize"))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning("PRAGMA optimize skipped: %s", e)
+
         # Auto-create superadmin on first run (if none exists).
         existing = User.query.filter_by(role=Role.SUPERADMIN.value).first()
         if not existing:
@@ -36,9 +36,13 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # SQLAlchemy pool settings (important for PostgreSQL)
+    # Background scraper threads and web requests share the pool, so the default
+    # pool_size=5 is too small and requests end up waiting on QueuePool.
     SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
         "pool_pre_ping": True,  # Test connections before using
-        "pool_recycle": 300,    # Recycle connections after 5 minutes
+        "pool_recycle": 1800,   # Recycle connections after 30 minutes
     }
     
     # Security
@@ -152,6 +156,8 @@ class TestingConfig(Config):
     
     # Use in-memory SQLite for tests
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # In-memory SQLite uses SingletonThreadPool, which takes no pool sizing options.
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     
     # Disable CSRF for testing
     WTF_CSRF_ENABLED = False
@@ -4,9 +4,31 @@ HTTP-слой разбит на тематические модули; бизн
 (report_upload, teacher_cabinet, api_helpers).
 """
 
-from flask import Blueprint
+import zlib
+
+from flask import Blueprint, jsonify, request
 
 bp = Blueprint("api", __name__, url_prefix="/api")
 
+# Потолок распакованного тела (как client_max_body_size в nginx) — защита от gzip-бомб
+MAX_DECOMPRESSED_BODY = 50 * 1024 * 1024
+
+
+@bp.before_request
+def _decompress_gzip_body():
+    """Desktop сжимает крупные тела (таблицы оценок) gzip — распаковываем до get_json()."""
+    if request.headers.get("Content-Encoding", "").lower() != "gzip":
+        return None
+    try:
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        raw = inflater.decompress(request.get_data(), MAX_DECOMPRESSED_BODY)
+        if inflater.unconsumed_tail:
+            return jsonify({"error": "Слишком большое тело запроса"}), 413
+    except zlib.error:
+        return jsonify({"error": "Некорректное сжатое тело запроса"}), 400
+    # get_json() читает закэшированное тело запроса
+    request._cached_data = raw
+    return None
+
 # Импорт модулей регистрирует маршруты на blueprint.
 from . import auth, grades, reports, schools, teacher  # noqa: E402,F401
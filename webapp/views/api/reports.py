@@ -1,6 +1,7 @@
 """Отчёты: загрузка (UPSERT), лог метаданных, список и удаление."""
 
-from flask import jsonify, request
+from flask import current_app, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
 
 from ...extensions import db
 from ...models import GradeReport, ReportFile
@@ -13,6 +14,9 @@ from ...services.report_upload import (
 )
 from . import bp
 
+# Максимум отчётов в одном запросе /reports/upload_batch
+MAX_BATCH_REPORTS = 200
+
 
 @bp.post("/reports/log")
 @require_jwt
@@ -103,6 +107,56 @@ def api_upload_report():
     return jsonify({"success": True, **result}), 200
 
 
+@bp.post("/reports/upload_batch")
+@require_jwt
+def api_upload_reports_batch():
+    """
+    Пакетная загрузка отчётов: каждый элемент обрабатывается как /reports/upload
+
+    Request:
+        {"reports": [{<тело /reports/upload>}, ...]}
+
+    Response:
+        {
+            "success": true,
+            "results": [
+                {"success": true, "report_id": 123, "action": "created"},
+                {"success": false, "status": 404, "error": "...", "org_not_found": true},
+                ...
+            ]
+        }
+    """
+    user = request.current_user
+    data = request.get_json()
+
+    if not data or "reports" not in data:
+        return jsonify({"error": "Отсутствуют данные отчетов"}), 400
+
+    reports = data["reports"]
+    if not isinstance(reports, list):
+        return jsonify({"error": "reports должен быть массивом"}), 400
+    if len(reports) > MAX_BATCH_REPORTS:
+        return jsonify({"error": f"Не более {MAX_BATCH_REPORTS} отчётов за запрос"}), 400
+
+    results = []
+    for item in reports:
+        if not isinstance(item, dict):
+            results.append({"success": False, "status": 400, "error": "Отсутствуют данные запроса"})
+            continue
+        try:
+            results.append({"success": True, **upsert_grade_report(user, item)})
+        except ReportUploadError as exc:
+            db.session.rollback()
+            results.append({"success": False, "status": exc.status, **exc.to_payload()})
+        except SQLAlchemyError:
+            # Каждый элемент коммитится отдельно: ошибка БД не должна скрыть уже сохранённые
+            db.session.rollback()
+            current_app.logger.exception("upload_batch item failed")
+            results.append({"success": False, "status": 500, "error": "Ошибка сохранения отчёта"})
+
+    return jsonify({"success": True, "results": results}), 200
+
+
 @bp.delete("/reports/all")
 @require_jwt
 def api_delete_all_reports():